@@ -0,0 +1,47 @@
+from django.conf import settings
+from djoser import email
+
+from .tasks import send_email
+
+# djoser's emails, rendered in the request (templates need the request and a
+# fresh token) but handed to the task queue for delivery, so signup and
+# password reset do not wait on the mail server.
+
+
+class QueuedEmailMixin:
+    def send(self, to, fail_silently=False, **kwargs):
+        self.render()
+        send_email.delay(
+            self.subject,
+            self.body,
+            kwargs.get('from_email', settings.DEFAULT_FROM_EMAIL),
+            list(to),
+            html=self.html,
+            cc=kwargs.get('cc'),
+            bcc=kwargs.get('bcc'),
+            reply_to=kwargs.get('reply_to'),
+        )
+
+
+class ActivationEmail(QueuedEmailMixin, email.ActivationEmail):
+    pass
+
+
+class ConfirmationEmail(QueuedEmailMixin, email.ConfirmationEmail):
+    pass
+
+
+class PasswordResetEmail(QueuedEmailMixin, email.PasswordResetEmail):
+    pass
+
+
+class PasswordChangedConfirmationEmail(QueuedEmailMixin, email.PasswordChangedConfirmationEmail):
+    pass
+
+
+class UsernameChangedConfirmationEmail(QueuedEmailMixin, email.UsernameChangedConfirmationEmail):
+    pass
+
+
+class UsernameResetEmail(QueuedEmailMixin, email.UsernameResetEmail):
+    pass
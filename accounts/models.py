@@ -24,6 +24,7 @@ class CustomUser(AbstractUser):
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)  # See estore/images.py
 
     USERNAME_FIELD = 'email'  # Login using email
     REQUIRED_FIELDS = ['username']  # Still require username on creation
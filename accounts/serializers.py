@@ -1,4 +1,6 @@
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from rest_framework import serializers
+from estore.images import variant_urls
 from .models import CustomUser
 
 # For user creation (registering new users)
@@ -13,10 +15,16 @@ class UserProfileCreateSerializer(UserCreateSerializer):
 
 # For retrieving and updating user information
 class UserProfileSerializer(UserSerializer):
+    profile_picture_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = CustomUser
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name',
-            'phone_number', 'address', 'profile_picture', 'is_staff', 'is_superuser'
+            'phone_number', 'address', 'profile_picture', 'profile_picture_variants',
+            'is_staff', 'is_superuser'
         ]
         read_only_fields = ['id']
+
+    def get_profile_picture_variants(self, obj):
+        return variant_urls(obj.profile_picture_variants, self.context.get('request'))
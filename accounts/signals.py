@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from estore import images
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+def generate_profile_picture_variants(sender, instance, **kwargs):
+    # Resize new uploads in the background once the row is committed
+    images.schedule(instance, 'profile_picture', 'profile_picture_variants')
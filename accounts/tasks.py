@@ -0,0 +1,14 @@
+from django.core.mail import EmailMultiAlternatives
+
+from tasks.queue import task
+
+
+@task(max_attempts=8, retry_delay=30)
+def send_email(subject, body, from_email, to, html=None, cc=None, bcc=None, reply_to=None):
+    """Deliver an email rendered during the request (see accounts/email.py)."""
+    message = EmailMultiAlternatives(subject, body, from_email, to, cc=cc, bcc=bcc, reply_to=reply_to)
+    if html and html != body:
+        message.attach_alternative(html, 'text/html')
+    elif html:
+        message.content_subtype = 'html'
+    message.send()
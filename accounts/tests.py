@@ -1,3 +1,39 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from estore.query_budget import QueryBudgetMixin
+from .models import CustomUser
+
+
+class AccountQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def test_me(self):
+        user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        self.authenticate(user)
+        with self.assertQueryBudget(1):
+            response = self.client.get('/api/accounts/users/me/')
+        self.assertEqual(response.json()['email'], 'shopper@example.com')
+
+    def test_user_list_staff(self):
+        staff = CustomUser.objects.create_user(email='staff@example.com', username='staff', is_staff=True)
+        CustomUser.objects.bulk_create([
+            CustomUser(email=f'user{i}@example.com', username=f'user{i}') for i in range(100)
+        ])
+        self.authenticate(staff)
+        with self.assertQueryBudget(2, max_time_ms=500):
+            response = self.client.get('/api/accounts/users/')
+        self.assertEqual(len(response.json()), 101)
+
+    def test_jwt_create(self):
+        CustomUser.objects.create_user(email='shopper@example.com', username='shopper', password='s3cret-pass')
+        with self.assertQueryBudget(2):
+            response = self.client.post(
+                '/api/auth/jwt/create/', {'email': 'shopper@example.com', 'password': 's3cret-pass'}, format='json'
+            )
+        self.assertIn('access', response.json())
@@ -0,0 +1,241 @@
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from orders.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from products.models import CatalogChange, Category, Product
+
+WORDS = (
+    'classic', 'wireless', 'smart', 'compact', 'premium', 'portable', 'organic', 'vintage',
+    'ultra', 'eco', 'deluxe', 'mini', 'pro', 'essential', 'rugged', 'silent',
+)
+NOUNS = (
+    'speaker', 'lamp', 'backpack', 'kettle', 'monitor', 'jacket', 'camera', 'blender',
+    'keyboard', 'chair', 'watch', 'headphones', 'mug', 'drone', 'charger', 'tent',
+)
+
+
+def next_id(*models):
+    """First key past every existing row of ``models`` (which share an id space)."""
+    return max((model.objects.aggregate(Max('pk'))['pk__max'] or 0) for model in models) + 1
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep generated values for auto_now/auto_now_add fields."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class ZipfSampler:
+    """
+    Draw product ids with Zipfian popularity: the k-th most popular product is
+    picked with weight 1 / k**s. Ranks are shuffled over ids so popularity is
+    not correlated with insertion order.
+    """
+
+    def __init__(self, ids, s, rng):
+        self.ids = list(ids)
+        rng.shuffle(self.ids)
+        self.cum_weights = list(itertools.accumulate(1 / rank ** s for rank in range(1, len(self.ids) + 1)))
+        self.rng = rng
+
+    def sample(self, k):
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights, k=k)
+
+    def sample_distinct(self, k):
+        picked = dict.fromkeys(self.sample(k))
+        return list(picked)
+
+
+class DatasetGenerator:
+    """
+    Generate a deterministic synthetic dataset with batched bulk_create.
+
+    Primary keys are assigned up front from the current table maximum, so
+    related rows can be built without reading anything back, and every user
+    shares one password hash instead of paying for PBKDF2 per row.
+    """
+
+    def __init__(self, seed=42, batch_size=10000, zipf_s=1.1, days=730,
+                 password='password', log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.zipf_s = zipf_s
+        self.days = days
+        self.password = password
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def generate(self, categories, products, users, carts, cart_items, orders, order_lines):
+        self.category_ids = self.create_categories(categories)
+        self.prices = {}
+        self.product_ids = self.create_products(products)
+        self.sampler = ZipfSampler(self.product_ids, self.zipf_s, self.rng)
+        self.user_ids = self.create_users(users)
+        self.create_carts(min(carts, users), cart_items)
+        self.create_orders(orders, order_lines)
+        self.reset_sequences()
+
+    def insert(self, model, rows, total):
+        """bulk_create rows from a generator in batches, logging throughput."""
+        start = time.perf_counter()
+        created = 0
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+            created += len(batch)
+            if created % (self.batch_size * 10) < self.batch_size or created == total:
+                elapsed = time.perf_counter() - start
+                self.log(f'  {model._meta.label}: {created:,}/{total:,} '
+                         f'({created / elapsed:,.0f} rows/s)')
+        return created
+
+    def timestamp(self):
+        return self.now - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def record_changes(self, entity, ids):
+        """Log the new rows for the catalog changes feed, as the importer does."""
+        self.insert(CatalogChange, (
+            CatalogChange(entity=entity, object_id=pk, action=CatalogChange.UPSERT) for pk in ids
+        ), len(ids))
+
+    def create_categories(self, count):
+        first = next_id(Category)
+        ids = range(first, first + count)
+        self.insert(Category, (
+            Category(pk=pk, name=f'{self.rng.choice(WORDS).title()} {self.rng.choice(NOUNS)}s #{pk}',
+                     description='')
+            for pk in ids
+        ), count)
+        self.record_changes(CatalogChange.CATEGORY, ids)
+        return list(ids)
+
+    def create_products(self, count):
+        first = next_id(Product)
+        ids = range(first, first + count)
+        conditions = [choice for choice, _ in Product.CONDITION_CHOICES]
+
+        def rows():
+            for pk in ids:
+                price = Decimal(self.rng.randint(199, 99999)) / 100
+                self.prices[pk] = price
+                name = f'{self.rng.choice(WORDS).title()} {self.rng.choice(WORDS)} {self.rng.choice(NOUNS)}'
+                yield Product(
+                    pk=pk, name=name, description=f'{name} #{pk}', price=price,
+                    category_id=self.rng.choice(self.category_ids),
+                    stock=self.rng.randint(0, 1000), condition=self.rng.choice(conditions),
+                )
+
+        self.insert(Product, rows(), count)
+        self.record_changes(CatalogChange.PRODUCT, ids)
+        return list(ids)
+
+    def create_users(self, count):
+        User = get_user_model()
+        first = next_id(User)
+        ids = range(first, first + count)
+        password = make_password(self.password)
+        with explicit_timestamps(User._meta.get_field('date_joined')):
+            self.insert(User, (
+                User(pk=pk, email=f'user{pk}@example.com', username=f'user{pk}',
+                     password=password, date_joined=self.timestamp())
+                for pk in ids
+            ), count)
+        return list(ids)
+
+    def create_carts(self, count, items_per_cart):
+        first = next_id(Cart)
+        owners = self.rng.sample(self.user_ids, count)
+        cart_ids = range(first, first + count)
+        with explicit_timestamps(Cart._meta.get_field('created_at')):
+            self.insert(Cart, (
+                Cart(pk=pk, user_id=user_id, created_at=self.timestamp())
+                for pk, user_id in zip(cart_ids, owners)
+            ), count)
+
+        def items():
+            for cart_id in cart_ids:
+                size = self.rng.randint(1, max(2 * items_per_cart - 1, 1))
+                for product_id in self.sampler.sample_distinct(size):
+                    yield CartItem(cart_id=cart_id, product_id=product_id,
+                                   quantity=self.rng.randint(1, 3))
+
+        self.insert(CartItem, items(), count * items_per_cart)
+
+    def create_orders(self, count, lines):
+        first_order = next_id(Order, ArchivedOrder)
+        first_line = next_id(OrderItem, ArchivedOrderItem)
+        order_ids = range(first_order, first_order + count)
+        statuses = [choice for choice, _ in Order.STATUS_CHOICES]
+        line_ids = itertools.count(first_line)
+        pending_lines = []
+
+        # Spread the requested number of lines over the orders, at least one each
+        mean = max(lines / max(count, 1), 1)
+
+        def orders():
+            for pk in order_ids:
+                size = max(1, round(self.rng.expovariate(1 / mean)))
+                total = Decimal(0)
+                for product_id in self.sampler.sample_distinct(size):
+                    quantity = self.rng.randint(1, 3)
+                    price = self.prices[product_id]
+                    total += price * quantity
+                    pending_lines.append(OrderItem(
+                        pk=next(line_ids), order_id=pk, product_id=product_id,
+                        quantity=quantity, price=price,
+                    ))
+                created_at = self.timestamp()
+                yield Order(
+                    pk=pk, user_id=self.rng.choice(self.user_ids), created_at=created_at,
+                    updated_at=created_at, status=self.rng.choice(statuses),
+                    total_price=total, order_number=f'ORD-{pk}',
+                )
+
+        # Orders go first (foreign key), then the lines generated alongside them
+        generator = orders()
+        created_orders = created_lines = 0
+        start = time.perf_counter()
+        with explicit_timestamps(Order._meta.get_field('created_at'), Order._meta.get_field('updated_at')):
+            while True:
+                batch = list(itertools.islice(generator, self.batch_size))
+                if not batch:
+                    break
+                Order.objects.bulk_create(batch, batch_size=self.batch_size)
+                OrderItem.objects.bulk_create(pending_lines, batch_size=self.batch_size)
+                created_orders += len(batch)
+                created_lines += len(pending_lines)
+                pending_lines.clear()
+                elapsed = time.perf_counter() - start
+                self.log(f'  orders: {created_orders:,}/{count:,}, order lines: {created_lines:,} '
+                         f'({created_lines / elapsed:,.0f} lines/s)')
+
+    def reset_sequences(self):
+        """Move sequences past the pre-assigned keys (no-op on SQLite)."""
+        User = get_user_model()
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Category, Product, User, Cart, CartItem, Order, OrderItem]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,214 @@
+import json
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.seed import BENCH_EMAIL, seed_dataset
+from benchmarks.traffic import DEFAULT_MIX, ClientDriver, HttpDriver, Recorder, login, run_user
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the browse -> cart -> checkout benchmark and report throughput, '
+        'p50/p95/p99 latency and SQL query counts per endpoint.\n\n'
+        'Without --base-url the traffic runs in-process through the test client '
+        'against a throwaway test database (or the configured one with --no-test-db), '
+        'with rate limits off. With --base-url '
+        'it is sent to a live server (SQL counts are then unavailable; start it '
+        'with THROTTLE_DISABLED=1).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help='Benchmark a running server instead of the test client')
+        parser.add_argument('--no-test-db', action='store_true',
+                            help='Run the in-process client against the configured database '
+                                 'instead of a throwaway test database')
+        parser.add_argument('--seed-data', action='store_true',
+                            help='With --base-url or --no-test-db, seed the configured database before running')
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--orders-per-user', type=int, default=3)
+        parser.add_argument('--requests', type=int, default=1000, help='Total user actions to issue')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Concurrent virtual users (live server only)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for data and traffic')
+        parser.add_argument('--mix', nargs='*', default=[], metavar='ACTION=WEIGHT',
+                            help=f"Override action weights; actions: {', '.join(DEFAULT_MIX)}")
+        parser.add_argument('--output', help='Write the JSON report to this file ("-" for stdout)')
+        parser.add_argument('--baseline', help='Compare against a previous JSON report')
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+
+        if options['base_url']:
+            recorder, elapsed = self.run_http(options, mix)
+            mode = 'http'
+        else:
+            recorder, elapsed = self.run_client(options, mix)
+            mode = 'client'
+
+        report = {
+            'meta': {
+                'mode': mode,
+                'commit': self.git_commit(),
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': settings.DATABASES['default']['ENGINE'],
+            },
+            'config': {
+                key: options[key] for key in (
+                    'categories', 'products', 'users', 'orders_per_user',
+                    'requests', 'concurrency', 'seed',
+                )
+            },
+            'mix': mix,
+            'elapsed_s': round(elapsed, 3),
+            'endpoints': recorder.report(elapsed),
+        }
+
+        # Keep stdout clean for the JSON document when it is written there
+        out = self.stderr if options['output'] == '-' else self.stdout
+        self.print_table(out, report)
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                self.print_comparison(out, json.load(fh), report)
+
+        if options['output']:
+            document = json.dumps(report, indent=2, sort_keys=True)
+            if options['output'] == '-':
+                self.stdout.write(document)
+            else:
+                with open(options['output'], 'w') as fh:
+                    fh.write(document + '\n')
+
+    def parse_mix(self, overrides):
+        mix = dict(DEFAULT_MIX)
+        for override in overrides:
+            action, _, weight = override.partition('=')
+            if action not in mix or not weight.isdigit():
+                raise CommandError(f'Invalid --mix entry {override!r}.')
+            mix[action] = int(weight)
+        return {action: weight for action, weight in mix.items() if weight}
+
+    def run_client(self, options, mix):
+        if options['no_test_db']:
+            return self.drive_client(options, mix, seed=options['seed_data'])
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            return self.drive_client(options, mix, seed=True)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def drive_client(self, options, mix, seed):
+        if seed:
+            dataset = self.seed(options)
+            emails, product_ids = dataset['users'], dataset['products']
+        else:
+            emails = [BENCH_EMAIL.format(i) for i in range(options['users'])]
+            product_ids = list(Product.objects.values_list('pk', flat=True))
+        User = get_user_model()
+        users = User.objects.filter(email__in=emails)
+        tokens = {user.email: str(AccessToken.for_user(user)) for user in users}
+        if not tokens or not product_ids:
+            raise CommandError('No benchmark users or products found; run with --seed-data.')
+
+        driver = ClientDriver()
+        per_user = max(options['requests'] // len(tokens), 1)
+        recorder = Recorder()
+        start = time.perf_counter()
+        # All virtual users share one client address
+        with override_settings(THROTTLE_RATES={}, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for index, (email, token) in enumerate(sorted(tokens.items())):
+                recorder.merge(run_user(driver, email, token, product_ids, mix,
+                                        per_user, options['seed'] + index))
+        return recorder, time.perf_counter() - start
+
+    def run_http(self, options, mix):
+        if options['seed_data']:
+            emails = self.seed(options)['users']
+        else:
+            emails = [BENCH_EMAIL.format(i) for i in range(options['users'])]
+
+        driver = HttpDriver(options['base_url'])
+        status, _, _, _, payload = driver.request('GET', '/api/products/products/')
+        if status != 200 or not payload:
+            raise CommandError('Could not list products from the server; is it seeded?')
+        product_ids = [product['id'] for product in payload]
+
+        concurrency = options['concurrency']
+        emails = [emails[i % len(emails)] for i in range(concurrency)]
+        tokens = [login(driver, email) for email in emails]
+        per_user = max(options['requests'] // concurrency, 1)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [
+                pool.submit(run_user, driver, email, token, product_ids, mix,
+                            per_user, options['seed'] + index)
+                for index, (email, token) in enumerate(zip(emails, tokens))
+            ]
+            recorder = Recorder()
+            for future in futures:
+                recorder.merge(future.result())
+        return recorder, time.perf_counter() - start
+
+    def seed(self, options):
+        return seed_dataset(
+            categories=options['categories'],
+            products=options['products'],
+            users=options['users'],
+            orders_per_user=options['orders_per_user'],
+            seed=options['seed'],
+        )
+
+    def git_commit(self):
+        try:
+            result = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return result.stdout.strip()
+
+    def print_table(self, out, report):
+        out.write(
+            f"{'endpoint':<16} {'reqs':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'sql ms':>8}"
+        )
+        for endpoint, stats in report['endpoints'].items():
+            queries = '-' if stats['queries_mean'] is None else f"{stats['queries_mean']:.1f}"
+            sql_ms = '-' if stats['sql_ms_mean'] is None else f"{stats['sql_ms_mean']:.2f}"
+            out.write(
+                f"{endpoint:<16} {stats['requests']:>6} {stats['errors']:>4} "
+                f"{stats['throughput']:>8.1f} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+                f"{stats['p99_ms']:>8.2f} {queries:>8} {sql_ms:>8}"
+            )
+
+    def print_comparison(self, out, baseline, report):
+        out.write(f"\nChange vs baseline {baseline['meta'].get('commit') or '(unknown)'}:")
+        for endpoint, stats in report['endpoints'].items():
+            before = baseline['endpoints'].get(endpoint)
+            if not before:
+                continue
+            deltas = []
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean'):
+                if before.get(key) and stats.get(key) is not None:
+                    deltas.append(f'{key} {(stats[key] - before[key]) / before[key]:+.1%}')
+            out.write(f"  {endpoint:<16} {', '.join(deltas)}")
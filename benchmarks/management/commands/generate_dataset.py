@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.datagen import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-generate a deterministic synthetic dataset (categories, products, '
+        'users, carts and orders) with Zipfian product popularity, for scale '
+        'testing. Rows are appended to the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=100)
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--carts', type=int, default=20000, help='Users with an open cart')
+        parser.add_argument('--cart-items', type=int, default=3, help='Mean items per cart')
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--order-lines', type=int, default=3000000, help='Approximate total order lines')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent for product popularity')
+        parser.add_argument('--days', type=int, default=730, help='Spread timestamps over this many days')
+        parser.add_argument('--password', default='password', help='Password shared by all generated users')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            zipf_s=options['zipf'],
+            days=options['days'],
+            password=options['password'],
+            log=self.stdout.write,
+        )
+
+        start = time.perf_counter()
+        generator.generate(
+            categories=options['categories'],
+            products=options['products'],
+            users=options['users'],
+            carts=options['carts'],
+            cart_items=options['cart_items'],
+            orders=options['orders'],
+            order_lines=options['order_lines'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - start:.1f}s'))
@@ -0,0 +1,89 @@
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.stats import http_request, summarize
+
+# Each target serves the same catalog payloads: the sync DRF routes behind a
+# WSGI server, and the async mirrors behind an ASGI server (e.g. uvicorn).
+TARGETS = {
+    'wsgi': {
+        'product-list': '/api/products/products/',
+        'product-detail': '/api/products/products/{pk}/',
+        'category-list': '/api/products/categories/',
+    },
+    'asgi': {
+        'product-list': '/api/products/async/products/',
+        'product-detail': '/api/products/async/products/{pk}/',
+        'category-list': '/api/products/async/categories/',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput and tail latency of the catalog endpoints served by a '
+        'WSGI server against their async mirrors served by an ASGI server.\n\n'
+        'Example:\n'
+        '  export THROTTLE_DISABLED=1  # both servers apply the product list rate limits\n'
+        '  gunicorn estore.wsgi -w 4 -b :8000 &\n'
+        '  uvicorn estore.asgi:application --workers 4 --port 8001 &\n'
+        '  python manage.py loadtest_catalog --wsgi-url http://127.0.0.1:8000 '
+        '--asgi-url http://127.0.0.1:8001'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', help='Base URL of the WSGI server')
+        parser.add_argument('--asgi-url', help='Base URL of the ASGI server')
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Requests per endpoint and server')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50],
+                            help='Concurrency levels to run')
+
+    def handle(self, *args, **options):
+        servers = {
+            name: options[f'{name}_url'].rstrip('/')
+            for name in TARGETS if options[f'{name}_url']
+        }
+        if not servers:
+            raise CommandError('Pass at least one of --wsgi-url / --asgi-url.')
+
+        self.stdout.write(
+            f"{'server':<6} {'endpoint':<16} {'conc':>5} {'req/s':>9} "
+            f"{'p50 ms':>9} {'p99 ms':>9} {'errors':>7}"
+        )
+        for name, base_url in servers.items():
+            product_ids = self.product_ids(base_url + TARGETS[name]['product-list'])
+            for endpoint, path in TARGETS[name].items():
+                for concurrency in options['concurrency']:
+                    result = self.run(base_url, path, product_ids,
+                                      options['requests'], concurrency)
+                    self.stdout.write(
+                        f"{name:<6} {endpoint:<16} {concurrency:>5} "
+                        f"{result['throughput']:>9.1f} {result['p50_ms']:>9.2f} "
+                        f"{result['p99_ms']:>9.2f} {result['errors']:>7}"
+                    )
+
+    def product_ids(self, url):
+        status, _, payload = http_request(url)
+        if status != 200:
+            raise CommandError(f'Could not list products from {url} (status {status}).')
+        ids = [product['id'] for product in payload]
+        if not ids:
+            raise CommandError('The catalog is empty; seed some products first.')
+        return ids
+
+    def run(self, base_url, path, product_ids, total, concurrency):
+        pks = itertools.cycle(product_ids)
+        urls = [base_url + path.format(pk=next(pks)) for _ in range(total)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(http_request, urls))
+        elapsed = time.perf_counter() - start
+
+        latencies = [seconds for status, seconds, _ in results if status == 200]
+        errors = len(results) - len(latencies)
+        return summarize(latencies, elapsed, errors)
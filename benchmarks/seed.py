@@ -0,0 +1,67 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from products.models import CatalogChange, Category, Product
+from orders.models import Order, OrderItem
+
+BENCH_PASSWORD = 'bench-password-1'
+BENCH_EMAIL = 'bench-{}@example.com'
+
+
+def seed_dataset(categories=10, products=200, users=20, orders_per_user=3,
+                 items_per_order=3, seed=42):
+    """
+    Create a small, reproducible catalog with users and order history.
+
+    All users share BENCH_PASSWORD, hashed once up front so seeding is not
+    dominated by PBKDF2.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+
+    category_objs = Category.objects.bulk_create([
+        Category(name=f'Category {i}', description=f'Benchmark category {i}')
+        for i in range(categories)
+    ])
+    product_objs = []
+    for i in range(products):
+        category = rng.choice(category_objs)
+        product_objs.append(Product(
+            name=f'Product {i}',
+            description=f'Benchmark product {i} in {category.name}',
+            price=Decimal(rng.randint(100, 100000)) / 100,
+            category=category,
+            stock=rng.randint(0, 500),
+            condition=rng.choice(Product.CONDITION_CHOICES)[0],
+        ))
+    product_objs = Product.objects.bulk_create(product_objs)
+    # bulk_create sends no signals; log the rows for the catalog changes feed
+    CatalogChange.record(CatalogChange.CATEGORY, [category.pk for category in category_objs])
+    CatalogChange.record(CatalogChange.PRODUCT, [product.pk for product in product_objs])
+
+    password = make_password(BENCH_PASSWORD)
+    user_objs = User.objects.bulk_create([
+        User(email=BENCH_EMAIL.format(i), username=f'bench-{i}', password=password)
+        for i in range(users)
+    ])
+
+    for user in user_objs:
+        for _ in range(orders_per_user):
+            lines = rng.sample(product_objs, min(items_per_order, len(product_objs)))
+            order = Order.objects.create(
+                user=user,
+                total_price=sum(product.price for product in lines),
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price)
+                for product in lines
+            ])
+
+    return {
+        'categories': [category.pk for category in category_objs],
+        'products': [product.pk for product in product_objs],
+        'users': [user.email for user in user_objs],
+    }
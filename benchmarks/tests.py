@@ -0,0 +1,91 @@
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from products.models import CatalogChange, Category, Product
+
+
+class BenchCommandTests(TestCase):
+    def test_client_run_reports_percentiles(self):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command(
+            'bench', no_test_db=True, seed_data=True, categories=2, products=5, users=2,
+            orders_per_user=1, requests=40, output='-', stdout=stdout, stderr=stderr,
+        )
+        report = json.loads(stdout.getvalue())
+
+        self.assertEqual(report['meta']['mode'], 'client')
+        self.assertEqual(report['config']['requests'], 40)
+        self.assertTrue(set(report['endpoints']) <= set(report['mix']) | {'cart-add-item'})
+        self.assertGreaterEqual(sum(stats['requests'] for stats in report['endpoints'].values()), 40)
+        for endpoint, stats in report['endpoints'].items():
+            with self.subTest(endpoint=endpoint):
+                self.assertEqual(stats['errors'], 0)
+                self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+                self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+                self.assertGreater(stats['throughput'], 0)
+                self.assertIsNotNone(stats['queries_mean'])
+        # The table goes to stderr when the JSON document is written to stdout
+        self.assertIn('p99 ms', stderr.getvalue())
+
+
+class GenerateDatasetTests(TestCase):
+    options = {
+        'categories': 3, 'products': 40, 'users': 12, 'carts': 5, 'cart_items': 2,
+        'orders': 30, 'order_lines': 60, 'batch_size': 7, 'seed': 7,
+    }
+
+    def generate(self, **options):
+        call_command('generate_dataset', stdout=io.StringIO(), **dict(self.options, **options))
+
+    def snapshot(self):
+        """Every generated value except timestamps and password salts."""
+        return {
+            'categories': list(Category.objects.order_by('pk').values_list('pk', 'name')),
+            'products': list(Product.objects.order_by('pk').values_list(
+                'pk', 'name', 'price', 'category_id', 'stock', 'condition')),
+            'users': list(get_user_model().objects.order_by('pk').values_list('pk', 'email')),
+            'carts': list(Cart.objects.order_by('pk').values_list('pk', 'user_id')),
+            'cart_items': list(CartItem.objects.order_by('pk').values_list('cart_id', 'product_id', 'quantity')),
+            'orders': list(Order.objects.order_by('pk').values_list('pk', 'user_id', 'status', 'total_price')),
+            'order_items': list(OrderItem.objects.order_by('pk').values_list(
+                'order_id', 'product_id', 'quantity', 'price')),
+        }
+
+    def clear(self):
+        for model in (OrderItem, Order, CartItem, Cart, Product, Category, get_user_model()):
+            model.objects.all().delete()
+
+    def test_row_counts(self):
+        self.generate()
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(get_user_model().objects.count(), 12)
+        self.assertEqual(Cart.objects.count(), 5)
+        self.assertEqual(Order.objects.count(), 30)
+        # At least one line per order, spread around the requested total
+        self.assertGreaterEqual(OrderItem.objects.count(), 30)
+        self.assertEqual(Order.objects.filter(items__isnull=True).count(), 0)
+        self.assertEqual(CartItem.objects.values('cart').distinct().count(), 5)
+        # The catalog changes feed sees the bulk-created catalog
+        self.assertCountEqual(
+            CatalogChange.objects.filter(entity=CatalogChange.PRODUCT).values_list('object_id', flat=True),
+            Product.objects.values_list('pk', flat=True),
+        )
+        self.assertEqual(CatalogChange.objects.filter(entity=CatalogChange.CATEGORY).count(), 3)
+
+    def test_same_seed_same_data(self):
+        self.generate()
+        first = self.snapshot()
+        self.clear()
+        self.generate()
+        self.assertEqual(self.snapshot(), first)
+
+        self.clear()
+        self.generate(seed=8)
+        self.assertNotEqual(self.snapshot()['products'], first['products'])
@@ -0,0 +1,170 @@
+import json
+import random
+import time
+from collections import defaultdict
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .seed import BENCH_PASSWORD
+from .stats import http_request, summarize
+
+# Relative weight of each user action in the mixed workload. Checkout adds an
+# item first so the cart is never empty; both steps are recorded separately.
+DEFAULT_MIX = {
+    'product-list': 25,
+    'product-search': 15,
+    'product-detail': 25,
+    'category-list': 8,
+    'cart': 8,
+    'cart-add-item': 8,
+    'checkout': 3,
+    'order-list': 6,
+    'login': 2,
+}
+
+SEARCH_TERMS = ['product', 'category', '1', '42', 'benchmark', 'zzz']
+
+
+class ClientDriver:
+    """Runs requests in-process through the test client and counts SQL."""
+
+    name = 'client'
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        data = json.dumps(body) if body is not None else ''
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self.client.generic(
+                method, path, data, content_type='application/json', headers=headers
+            )
+            elapsed = time.perf_counter() - start
+
+        sql_ms = sum(float(query['time']) for query in queries.captured_queries) * 1000
+        payload = response.json() if response.get('Content-Type', '').startswith('application/json') else None
+        return response.status_code, elapsed, len(queries), sql_ms, payload
+
+
+class HttpDriver:
+    """Runs requests against a live server; SQL counts are not observable."""
+
+    name = 'http'
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        status, elapsed, payload = http_request(self.base_url + path, method, body, headers)
+        return status, elapsed, None, None, payload
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, result, expected=(200, 201)):
+        status, elapsed, queries, sql_ms, _ = result
+        if status in expected:
+            self.samples[endpoint].append((elapsed, queries, sql_ms))
+        else:
+            self.errors[endpoint] += 1
+        return result
+
+    def merge(self, other):
+        for endpoint, samples in other.samples.items():
+            self.samples[endpoint].extend(samples)
+        for endpoint, errors in other.errors.items():
+            self.errors[endpoint] += errors
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint in sorted(set(self.samples) | set(self.errors)):
+            samples = self.samples[endpoint]
+            stats = summarize([sample[0] for sample in samples], elapsed, self.errors[endpoint])
+            queries = [sample[1] for sample in samples if sample[1] is not None]
+            sql_ms = [sample[2] for sample in samples if sample[2] is not None]
+            stats['queries_mean'] = round(sum(queries) / len(queries), 2) if queries else None
+            stats['queries_max'] = max(queries) if queries else None
+            stats['sql_ms_mean'] = round(sum(sql_ms) / len(sql_ms), 3) if sql_ms else None
+            endpoints[endpoint] = stats
+        return endpoints
+
+
+class VirtualUser:
+    """One shopper issuing a random sequence of actions drawn from the mix."""
+
+    def __init__(self, driver, email, token, product_ids, mix, rng):
+        self.driver = driver
+        self.email = email
+        self.token = token
+        self.product_ids = product_ids
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.rng = rng
+
+    def step(self, recorder):
+        action = self.rng.choices(self.actions, self.weights)[0]
+        getattr(self, 'do_' + action.replace('-', '_'))(recorder)
+
+    def get(self, recorder, endpoint, path, auth=False):
+        recorder.record(endpoint, self.driver.request('GET', path, token=self.token if auth else None))
+
+    def do_product_list(self, recorder):
+        self.get(recorder, 'product-list', '/api/products/products/')
+
+    def do_product_search(self, recorder):
+        term = self.rng.choice(SEARCH_TERMS)
+        self.get(recorder, 'product-search', f'/api/products/products/?search={term}')
+
+    def do_product_detail(self, recorder):
+        pk = self.rng.choice(self.product_ids)
+        self.get(recorder, 'product-detail', f'/api/products/products/{pk}/')
+
+    def do_category_list(self, recorder):
+        self.get(recorder, 'category-list', '/api/products/categories/')
+
+    def do_cart(self, recorder):
+        self.get(recorder, 'cart', '/api/cart/', auth=True)
+
+    def do_cart_add_item(self, recorder):
+        body = {'product_id': self.rng.choice(self.product_ids), 'quantity': self.rng.randint(1, 3)}
+        recorder.record('cart-add-item', self.driver.request('POST', '/api/cart/add_item/', body, self.token))
+
+    def do_checkout(self, recorder):
+        self.do_cart_add_item(recorder)
+        recorder.record(
+            'checkout',
+            self.driver.request('POST', '/api/orders/create_from_cart/', {}, self.token),
+        )
+
+    def do_order_list(self, recorder):
+        self.get(recorder, 'order-list', '/api/orders/', auth=True)
+
+    def do_login(self, recorder):
+        body = {'email': self.email, 'password': BENCH_PASSWORD}
+        recorder.record('login', self.driver.request('POST', '/api/auth/jwt/create/', body))
+
+
+def login(driver, email):
+    """Obtain an access token through the JWT endpoint."""
+    status, _, _, _, payload = driver.request(
+        'POST', '/api/auth/jwt/create/', {'email': email, 'password': BENCH_PASSWORD}
+    )
+    if status != 200:
+        raise RuntimeError(f'Login failed for {email} (status {status}).')
+    return payload['access']
+
+
+def run_user(driver, email, token, product_ids, mix, requests, seed):
+    recorder = Recorder()
+    user = VirtualUser(driver, email, token, product_ids, mix, random.Random(seed))
+    for _ in range(requests):
+        user.step(recorder)
+    return recorder
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cart.models import Cart
+from estore.purge import delete_in_batches
+
+
+class Command(BaseCommand):
+    help = 'Delete carts, and their items, that have not changed for a while, in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-days', type=int,
+                            default=getattr(settings, 'CART_ABANDONED_AFTER_DAYS', 30),
+                            help='Delete carts not updated for this many days')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['idle_days'])
+        idle = Cart.objects.filter(updated_at__lt=cutoff)
+        carts = delete_in_batches(idle, options['batch_size'])[1].get('cart.Cart', 0)
+        self.stdout.write(self.style.SUCCESS(f'Removed {carts} abandoned cart(s).'))
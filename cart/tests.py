@@ -1,3 +1,95 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import CustomUser
+from estore.query_budget import QueryBudgetMixin
+from products.models import Category, Product
+from .models import Cart, CartItem
+
+
+class CartQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        category = Category.objects.create(name='Books')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Book {i}', description='', price=Decimal('5.00'), category=category, stock=10)
+            for i in range(50)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_cart_list(self):
+        cart = Cart.objects.create(user=self.user)
+        for size in (1, 50):
+            with self.subTest(cart_items=size):
+                CartItem.objects.all().delete()
+                CartItem.objects.bulk_create([CartItem(cart=cart, product=product) for product in self.products[:size]])
+                with self.assertQueryBudget(4, max_time_ms=500):
+                    response = self.client.get('/api/cart/')
+                self.assertEqual(len(response.json()[0]['items']), size)
+
+    def test_add_item(self):
+        product = self.products[0]
+        for attempt in ('create', 'increment'):
+            with self.subTest(attempt=attempt):
+                with self.assertQueryBudget(10):
+                    response = self.client.post(
+                        '/api/cart/add_item/', {'product_id': product.pk, 'quantity': 1}, format='json'
+                    )
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_update_item(self):
+        cart = Cart.objects.create(user=self.user)
+        item = CartItem.objects.create(cart=cart, product=self.products[0])
+        with self.assertQueryBudget(4):
+            response = self.client.put(
+                '/api/cart/update_item/', {'cart_item_id': item.pk, 'quantity': 3}, format='json'
+            )
+        self.assertEqual(response.json()['quantity'], 3)
+
+
+class AbandonedCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books')
+        cls.product = Product.objects.create(
+            name='Book', description='', price=Decimal('5.00'), category=category, stock=10
+        )
+        cls.users = [
+            CustomUser.objects.create_user(email=f'user{i}@example.com', username=f'user{i}') for i in range(3)
+        ]
+
+    def test_item_changes_mark_cart_active(self):
+        user = self.users[0]
+        cart = Cart.objects.create(user=user)
+        item = CartItem.objects.create(cart=cart, product=self.product)
+        stale = timezone.now() - timedelta(days=60)
+        Cart.objects.filter(pk=cart.pk).update(updated_at=stale)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        client.put('/api/cart/update_item/', {'cart_item_id': item.pk, 'quantity': 2}, format='json')
+        self.assertGreater(Cart.objects.get().updated_at, stale)
+
+    def test_purge_deletes_only_idle_carts(self):
+        carts = [Cart.objects.create(user=user) for user in self.users]
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=self.product) for cart in carts])
+        Cart.objects.filter(pk__in=[carts[0].pk, carts[1].pk]).update(
+            updated_at=timezone.now() - timedelta(days=45)
+        )
+
+        call_command('purge_abandoned_carts', idle_days=30, batch_size=1, stdout=io.StringIO())
 
-# Create your tests here.
+        self.assertEqual(list(Cart.objects.values_list('pk', flat=True)), [carts[2].pk])
+        self.assertEqual(list(CartItem.objects.values_list('cart_id', flat=True)), [carts[2].pk])
@@ -1,10 +1,19 @@
+from django.db.models import Prefetch
+from django.utils import timezone
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Cart, CartItem
 from .serializers import CartSerializer, CartItemSerializer
+from idempotency.decorators import idempotent
 from products.models import Product
 
+
+def touch(cart_id):
+    # Marks the cart active for purge_abandoned_carts without saving the row
+    Cart.objects.filter(pk=cart_id).update(updated_at=timezone.now())
+
+
 class CartViewSet(viewsets.ModelViewSet):
     queryset = Cart.objects.all()
     serializer_class = CartSerializer
@@ -12,20 +21,23 @@ class CartViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Users can only access their own cart
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user=self.request.user).select_related('user').prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.select_related('product__category'))
+        )
 
     def perform_create(self, serializer):
         # Automatically set the user to the current user
         serializer.save(user=self.request.user)
 
     @action(detail=False, methods=['POST'])
+    @idempotent
     def add_item(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
+        cart, cart_created = Cart.objects.get_or_create(user=request.user)
         product_id = request.data.get('product_id')
         quantity = request.data.get('quantity', 1)
 
         try:
-            product = Product.objects.get(id=product_id)
+            product = Product.objects.select_related('category').get(id=product_id)
         except Product.DoesNotExist:
             return Response({'error': 'Product not found'}, status=400)
 
@@ -37,14 +49,16 @@ class CartViewSet(viewsets.ModelViewSet):
 
         if not created:
             cart_item.quantity += quantity
-            cart_item.save()
+            cart_item.save(update_fields=['quantity'])
+        if not cart_created:
+            touch(cart.pk)
+        cart_item.product = product  # Already loaded with its category
 
         serializer = CartItemSerializer(cart_item)
         return Response(serializer.data)
 
     @action(detail=False, methods=['PUT'])
     def update_item(self, request):
-        cart = Cart.objects.get(user=request.user)
         cart_item_id = request.data.get('cart_item_id')
         quantity = request.data.get('quantity')
 
@@ -52,9 +66,12 @@ class CartViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Quantity must be at least 1'}, status=400)
 
         try:
-            cart_item = CartItem.objects.get(id=cart_item_id, cart=cart)
+            cart_item = CartItem.objects.select_related('product__category').get(
+                id=cart_item_id, cart__user=request.user
+            )
             cart_item.quantity = int(quantity)
-            cart_item.save()
+            cart_item.save(update_fields=['quantity'])
+            touch(cart_item.cart_id)
             serializer = CartItemSerializer(cart_item)
             return Response(serializer.data)
         except CartItem.DoesNotExist:
@@ -63,13 +80,13 @@ class CartViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['DELETE'])
     def remove_item(self, request, format=None):
-        cart = Cart.objects.get(user=request.user)
         cart_item_id = request.data.get('cart_item_id')
 
         try:
             # Filter by the cart_item's ID directly
-            cart_item = CartItem.objects.get(id=cart_item_id, cart=cart)
+            cart_item = CartItem.objects.get(id=cart_item_id, cart__user=request.user)
             cart_item.delete()
+            touch(cart_item.cart_id)
             return Response({'message': 'Item removed from cart'})
         except CartItem.DoesNotExist:
             return Response({'error': 'Item not found in cart'}, status=404)
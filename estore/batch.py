@@ -0,0 +1,259 @@
+"""
+Batched API requests.
+
+The frontend issues several independent requests on page load (current user,
+cart, categories, first product page), each paying for its own round trip and
+JWT verification. POST /api/batch/ takes them as one payload:
+
+    {"requests": [
+        {"id": "me", "method": "GET", "path": "/api/accounts/users/me/"},
+        {"id": "cart", "method": "GET", "path": "/api/cart/"},
+        {"id": "products", "method": "GET", "path": "/api/products/products/?ordering=price"}
+    ]}
+
+and answers with one entry per sub-request, in the same order:
+
+    {"responses": [{"id": "me", "status": 200, "headers": {...}, "body": {...}}, ...]}
+
+The access token is verified once and the user is handed to every
+sub-request, which is dispatched in-process through the URL resolver (no
+middleware runs for sub-requests). Sub-requests execute in order; under ASGI
+consecutive GET/HEAD sub-requests run concurrently, up to BATCH_MAX_CONCURRENCY
+at a time, and every write waits for the reads before it and blocks the ones
+after it.
+"""
+import asyncio
+import io
+import json
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.handlers.asgi import ASGIRequest
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+SAFE_METHODS = ('GET', 'HEAD')
+ALLOWED_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Sub-requests are always authenticated as the batch caller
+IGNORED_HEADERS = {'authorization', 'cookie', 'content-length', 'host'}
+
+# Request metadata a sub-request inherits from the batch request
+INHERITED_META = (
+    'SERVER_NAME', 'SERVER_PORT', 'REMOTE_ADDR', 'HTTP_HOST', 'HTTP_USER_AGENT',
+    'HTTP_ACCEPT_LANGUAGE', 'HTTP_X_FORWARDED_FOR', 'HTTP_X_FORWARDED_PROTO',
+)
+
+
+class BatchError(ValueError):
+    pass
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def _error(spec_id, status, detail):
+    return {'id': spec_id, 'status': status, 'headers': {}, 'body': {'detail': detail}}
+
+
+def _parse(request):
+    try:
+        payload = json.loads(request.body or b'null')
+    except ValueError:
+        raise BatchError('Malformed JSON.')
+    specs = payload.get('requests') if isinstance(payload, dict) else payload
+    if not isinstance(specs, list) or not specs:
+        raise BatchError('Expected a non-empty "requests" list.')
+    limit = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+    if len(specs) > limit:
+        raise BatchError(f'At most {limit} requests can be batched.')
+    if not all(isinstance(spec, dict) for spec in specs):
+        raise BatchError('Each request must be an object.')
+    return specs
+
+
+def _sub_request(parent, spec, user, token):
+    """Build the HttpRequest for one sub-request, or raise BatchError."""
+    method = str(spec.get('method', 'GET')).upper()
+    if method not in ALLOWED_METHODS:
+        raise BatchError(f'Method "{method}" is not allowed.')
+    url = spec.get('path')
+    if not isinstance(url, str) or not url.startswith('/'):
+        raise BatchError('"path" must be an absolute path.')
+    path, query = urlsplit(url)[2:4]
+
+    body = spec.get('body')
+    if body is None:
+        data = b''
+    elif isinstance(body, str):
+        data = body.encode()
+    else:
+        data = json.dumps(body, cls=JSONEncoder).encode()
+
+    environ = {key: parent.META[key] for key in INHERITED_META if key in parent.META}
+    headers = spec.get('headers') or {}
+    if not isinstance(headers, dict):
+        raise BatchError('"headers" must be an object.')
+    for name, value in headers.items():
+        if name.lower() in IGNORED_HEADERS:
+            continue
+        key = name.upper().replace('-', '_')
+        if key != 'CONTENT_TYPE':
+            key = f'HTTP_{key}'
+        environ[key] = str(value)
+    if data:
+        environ.setdefault('CONTENT_TYPE', 'application/json')
+    environ.update({
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_LENGTH': str(len(data)),
+        'wsgi.input': io.BytesIO(data),
+        'wsgi.url_scheme': parent.scheme,
+    })
+
+    request = WSGIRequest(environ)
+    request.user = user or AnonymousUser()
+    if user is not None:
+        # Picked up by rest_framework.request.Request in place of the authenticators
+        request._force_auth_user = user
+        request._force_auth_token = token
+    return request
+
+
+def _resolve(request):
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    if match.func is batch_view:
+        raise BatchError('Batch requests cannot be nested.')
+    request.resolver_match = match
+    return match
+
+
+def _body(response):
+    if response.streaming:
+        return None
+    content_type = response.get('Content-Type', '')
+    if content_type.startswith('application/json'):
+        return json.loads(response.content or 'null')
+    return response.content.decode(response.charset, errors='replace')
+
+
+def _dispatch_sync(request, match):
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+    except Exception as exc:
+        response = response_for_exception(request, exc)
+    return response
+
+
+def _dispatch_in_thread(request, match):
+    # Runs outside the request thread, so it owns (and must release) a connection
+    close_old_connections()
+    try:
+        return _dispatch_sync(request, match)
+    finally:
+        close_old_connections()
+
+
+async def _dispatch(spec, request, match, concurrent):
+    if match is None:
+        return _error(spec.get('id'), 404, 'Not found.')
+    if iscoroutinefunction(match.func):
+        try:
+            response = await match.func(request, *match.args, **match.kwargs)
+        except Exception as exc:
+            response = await sync_to_async(response_for_exception)(request, exc)
+    elif concurrent:
+        response = await sync_to_async(_dispatch_in_thread, thread_sensitive=False)(request, match)
+    else:
+        response = await sync_to_async(_dispatch_sync)(request, match)
+
+    return {
+        'id': spec.get('id'),
+        'status': response.status_code,
+        'headers': {
+            name: value for name, value in response.items()
+            if name.lower() not in ('content-length', 'vary')
+        },
+        'body': None if request.method == 'HEAD' else _body(response),
+    }
+
+
+async def _run(batch, concurrent, limit):
+    """Run one group of sub-requests; ``batch`` holds (spec, request, match)."""
+    if not concurrent or len(batch) == 1:
+        return [await _dispatch(*item, concurrent=False) for item in batch]
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(item):
+        async with semaphore:
+            return await _dispatch(*item, concurrent=True)
+
+    return await asyncio.gather(*(bounded(item) for item in batch))
+
+
+async def batch_view(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    try:
+        specs = _parse(request)
+    except BatchError as exc:
+        return _json({'detail': str(exc)}, status=400)
+
+    try:
+        auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        return _json({'detail': exc.detail}, status=401)
+    user, token = auth if auth is not None else (None, None)
+
+    # Only the ASGI handler can overlap requests; under WSGI this view already
+    # runs inside async_to_sync and threads would only add connection churn.
+    concurrent = isinstance(request, ASGIRequest)
+    limit = getattr(settings, 'BATCH_MAX_CONCURRENCY', 4)
+
+    responses = [None] * len(specs)
+    reads = []
+
+    async def flush():
+        results = await _run([item for _, item in reads], concurrent, limit)
+        for (index, _), result in zip(reads, results):
+            responses[index] = result
+        reads.clear()
+
+    for index, spec in enumerate(specs):
+        try:
+            sub_request = _sub_request(request, spec, user, token)
+            match = _resolve(sub_request)
+        except BatchError as exc:
+            responses[index] = _error(spec.get('id'), 400, str(exc))
+            continue
+        item = (spec, sub_request, match)
+        if sub_request.method in SAFE_METHODS:
+            reads.append((index, item))
+        else:
+            await flush()
+            responses[index] = await _dispatch(*item, concurrent=False)
+    await flush()
+
+    return _json({'responses': responses})
+
+
+# The batch carries its own bearer token and never uses the session cookie
+batch_view.csrf_exempt = True
@@ -0,0 +1,165 @@
+"""
+Responsive image variants for uploaded media.
+
+When a product image or profile picture changes, the upload is resized off the
+request path, in a small thread pool, into WebP and JPEG variants (thumbnail,
+card, detail). Variant filenames embed a hash of the source bytes, so they
+never change once written and can be cached forever. The resulting map is
+stored on the model in a JSON field and rendered by the serializers.
+"""
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+# Variant name -> longest edge in pixels
+VARIANTS = {
+    'thumbnail': 150,
+    'card': 400,
+    'detail': 1000,
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+HASH_LENGTH = 12
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def variant_name(source, digest, variant, extension):
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{stem}.{digest}.{variant}.{extension}')
+
+
+def build_variants(source, storage=default_storage):
+    """Render every variant of ``source`` and return the variant map."""
+    with storage.open(source, 'rb') as fh:
+        data = fh.read()
+    digest = content_hash(data)
+
+    with Image.open(io.BytesIO(data)) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+        variants = {}
+        for variant, edge in VARIANTS.items():
+            image = original.copy()
+            image.thumbnail((edge, edge), Image.LANCZOS)
+            entry = {'width': image.width, 'height': image.height}
+            for extension, (fmt, options) in FORMATS.items():
+                name = variant_name(source, digest, variant, extension)
+                if not storage.exists(name):
+                    rendered = image.convert('RGB') if fmt == 'JPEG' else image
+                    buffer = io.BytesIO()
+                    rendered.save(buffer, fmt, **options)
+                    storage.save(name, ContentFile(buffer.getvalue()))
+                entry[extension] = name
+            variants[variant] = entry
+
+    return {'source': source, 'hash': digest, 'variants': variants}
+
+
+def needs_variants(file_field, variants):
+    return bool(file_field) and (variants or {}).get('source') != file_field.name
+
+
+def process(model_label, pk, field_name, variants_field):
+    """Build and store variants for one row; runs in a worker thread or process."""
+    model = apps.get_model(model_label)
+    source = model.objects.filter(pk=pk).values_list(field_name, flat=True).first()
+    if not source:
+        return None
+
+    variants = build_variants(source)
+    # Only store the result if the image was not replaced in the meantime
+    model.objects.filter(pk=pk, **{field_name: source}).update(**{variants_field: variants})
+    return variants
+
+
+def _run(model_label, pk, field_name, variants_field):
+    close_old_connections()
+    try:
+        process(model_label, pk, field_name, variants_field)
+    finally:
+        close_old_connections()
+
+
+def _submit(model_label, pk, field_name, variants_field):
+    if getattr(settings, 'IMAGE_VARIANT_WORKERS', 2) == 0:
+        # Inline on the committing thread, e.g. in tests
+        process(model_label, pk, field_name, variants_field)
+    else:
+        _get_executor().submit(_run, model_label, pk, field_name, variants_field)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+                thread_name_prefix='image-variants',
+            )
+        return _executor
+
+
+def schedule(instance, field_name, variants_field):
+    """
+    Queue variant generation for ``instance`` once the current transaction
+    commits. Clears stale variants immediately when the image was removed.
+    """
+    file_field = getattr(instance, field_name)
+    variants = getattr(instance, variants_field)
+    model = type(instance)
+
+    if not file_field:
+        if variants:
+            model.objects.filter(pk=instance.pk).update(**{variants_field: {}})
+        return
+    if not needs_variants(file_field, variants):
+        return
+
+    label = model._meta.label
+    pk = instance.pk
+    transaction.on_commit(lambda: _submit(label, pk, field_name, variants_field))
+
+
+def variant_urls(variants, request=None, storage=default_storage):
+    """
+    Public URLs for a stored variant map, plus ready-made ``srcset`` strings
+    per format. Returns None when no variants have been generated yet.
+    """
+    if not variants or not variants.get('variants'):
+        return None
+
+    def url(name):
+        location = storage.url(name)
+        return request.build_absolute_uri(location) if request is not None else location
+
+    result = {}
+    srcset = {extension: [] for extension in FORMATS}
+    for variant, entry in variants['variants'].items():
+        result[variant] = {'width': entry['width'], 'height': entry['height']}
+        for extension in FORMATS:
+            result[variant][extension] = url(entry[extension])
+            srcset[extension].append(f"{result[variant][extension]} {entry['width']}w")
+    result['srcset'] = {extension: ', '.join(items) for extension, items in srcset.items()}
+    return result
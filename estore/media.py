@@ -0,0 +1,165 @@
+"""
+Serve files under MEDIA_ROOT.
+
+Replaces django.conf.urls.static.static(), which only works with DEBUG on,
+sends no caching headers and holds a worker for the whole transfer. This view
+answers conditional requests with 304, supports single byte ranges, marks
+content-hashed names (image variants) as immutable, and can hand the transfer
+itself to the front proxy:
+
+    MEDIA_SENDFILE = 'nginx'   # X-Accel-Redirect to MEDIA_ACCEL_REDIRECT_PREFIX + path
+    MEDIA_SENDFILE = 'apache'  # X-Sendfile with the absolute file path (also lighttpd)
+
+For nginx the prefix must map to MEDIA_ROOT in an ``internal`` location:
+
+    location /protected-media/ { internal; alias /srv/estore/media/; }
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from estore.images import HASH_LENGTH
+
+IMMUTABLE_NAME = re.compile(rf'\.[0-9a-f]{{{HASH_LENGTH}}}\.[^/]+$')
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+def _cache_control(path):
+    if IMMUTABLE_NAME.search(path):
+        return f'public, max-age={ONE_YEAR}, immutable'
+    return f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _byte_range(request, etag, mtime, size):
+    """
+    The (start, end) inclusive range to send, None for the whole file, or
+    False if the range cannot be satisfied. Multiple ranges are answered with
+    the whole file, which RFC 9110 allows.
+    """
+    header = request.META.get('HTTP_RANGE')
+    if not header:
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range:
+        if_range_date = parse_http_date_safe(if_range)
+        current = if_range == etag if if_range_date is None else int(mtime) <= if_range_date
+        if not current:
+            return None
+
+    match = RANGE_HEADER.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, path):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Not found')
+    try:
+        stat_result = os.stat(full_path)
+    except OSError:
+        raise Http404('Not found')
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404('Not found')
+
+    size = stat_result.st_size
+    mtime = stat_result.st_mtime
+    etag = f'"{size:x}-{stat_result.st_mtime_ns:x}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(mtime),
+        'Cache-Control': _cache_control(path),
+    }
+
+    if _not_modified(request, etag, mtime):
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    backend = getattr(settings, 'MEDIA_SENDFILE', None)
+    if backend:
+        # The proxy streams the file and handles ranges itself
+        response = HttpResponse(content_type=content_type)
+        if backend == 'nginx':
+            prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + path.lstrip('/')
+        else:
+            response['X-Sendfile'] = full_path
+    else:
+        byte_range = _byte_range(request, etag, mtime, size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is None:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+            response['Content-Length'] = str(size)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _read_range(full_path, start, length), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(length)
+        response['Accept-Ranges'] = 'bytes'
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for name, value in headers.items():
+        response[name] = value
+    return response
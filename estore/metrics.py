@@ -0,0 +1,331 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+MetricsMiddleware records, for every request, the latency, the number of SQL
+queries and the time spent in them (on whichever thread they run, see
+estore/sql_observers.py), and the response size, keyed by the resolved route
+name and HTTP method. Histograms use fixed buckets so a request
+only bumps a few integers; label strings are built only when /metrics is
+scraped.
+
+With several worker processes on one host, set METRICS_MULTIPROC_DIR to a
+directory shared by the workers (cleared on deploy). Each process snapshots
+its counters there from a background thread every METRICS_FLUSH_INTERVAL
+seconds and on exit, and the scrape merges all snapshots. Snapshots of
+processes that have exited are folded into one retired file at scrape time,
+so recycled workers neither leave files behind nor make totals go backwards.
+
+/metrics requires ``Authorization: Bearer <METRICS_TOKEN>``; without a token
+it is only served with DEBUG on.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from estore import sql_observers
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class Series:
+    """Counters for one (route, method) pair."""
+
+    __slots__ = (
+        'latency', 'latency_sum', 'queries', 'queries_sum', 'sql_seconds',
+        'size', 'size_sum', 'statuses',
+    )
+
+    def __init__(self):
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.queries = [0] * (len(QUERY_BUCKETS) + 1)
+        self.queries_sum = 0
+        self.sql_seconds = 0.0
+        self.size = [0] * (len(SIZE_BUCKETS) + 1)
+        self.size_sum = 0
+        self.statuses = {}
+
+    def observe(self, seconds, queries, sql_seconds, size, status):
+        self.latency[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum += seconds
+        self.queries[bisect_left(QUERY_BUCKETS, queries)] += 1
+        self.queries_sum += queries
+        self.sql_seconds += sql_seconds
+        if size is not None:
+            self.size[bisect_left(SIZE_BUCKETS, size)] += 1
+            self.size_sum += size
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def merge(self, data):
+        for name in ('latency', 'queries', 'size'):
+            counts = getattr(self, name)
+            for index, value in enumerate(data[name]):
+                counts[index] += value
+        self.latency_sum += data['latency_sum']
+        self.queries_sum += data['queries_sum']
+        self.sql_seconds += data['sql_seconds']
+        self.size_sum += data['size_sum']
+        for status, count in data['statuses'].items():
+            status = int(status)
+            self.statuses[status] = self.statuses.get(status, 0) + count
+
+
+SNAPSHOT_NAME = re.compile(r'^metrics-(\d+)-[0-9a-f]+\.json$')
+RETIRED_NAME = 'metrics-retired.json'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge_snapshot(merged, snapshot):
+    for route, method, data in snapshot:
+        key = (route, method)
+        if key not in merged:
+            merged[key] = Series()
+        merged[key].merge(data)
+
+
+def _snapshot(series):
+    return [[route, method, data.to_dict()] for (route, method), data in series.items()]
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(data, fh)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+class Registry:
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.series = {}
+        self.lock = threading.Lock()
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.flusher_pid = None
+        self.path = None
+
+    def observe(self, route, method, seconds, queries, sql_seconds, size, status):
+        key = (route, method)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = Series()
+            series.observe(seconds, queries, sql_seconds, size, status)
+
+        if self.directory and self.flusher_pid != os.getpid():
+            self.start_flusher()
+
+    def start_flusher(self):
+        """
+        Start the flush thread for this process. Threads do not survive a
+        fork, so a worker forked from a preloaded parent starts its own, and
+        writes under a fresh name so it never overwrites another process's
+        snapshot, even one with the same recycled pid.
+        """
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+            self.path = os.path.join(self.directory, f'metrics-{os.getpid()}-{uuid.uuid4().hex}.json')
+        threading.Thread(target=self.flush_periodically, name='metrics-flush', daemon=True).start()
+        atexit.register(self.flush)
+
+    def flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write this process's counters to the shared directory."""
+        if self.path is None:
+            return
+        with self.lock:
+            snapshot = _snapshot(self.series)
+        _write_json(self.path, snapshot)
+
+    def retire_dead(self):
+        """Fold the snapshots of exited processes into the retired file."""
+        dead = [
+            path for path in glob.glob(os.path.join(self.directory, 'metrics-*.json'))
+            if (match := SNAPSHOT_NAME.match(os.path.basename(path))) and not _pid_alive(int(match[1]))
+        ]
+        if not dead:
+            return
+        retired_path = os.path.join(self.directory, RETIRED_NAME)
+        retired = {}
+        _merge_snapshot(retired, _read_json(retired_path) or [])
+        for path in dead:
+            _merge_snapshot(retired, _read_json(path) or [])
+        _write_json(retired_path, _snapshot(retired))
+        for path in dead:
+            os.remove(path)
+
+    def collect(self):
+        """Counters for every process (or just this one without a shared directory)."""
+        if not self.directory:
+            with self.lock:
+                merged = {}
+                _merge_snapshot(merged, _snapshot(self.series))
+                return merged
+
+        if self.flusher_pid != os.getpid():
+            self.start_flusher()
+        self.flush()
+        merged = {}
+        # Scrapes in other workers may be retiring files at the same time
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.retire_dead()
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                _merge_snapshot(merged, _read_json(path) or [])
+        return merged
+
+
+registry = Registry(
+    directory=getattr(settings, 'METRICS_MULTIPROC_DIR', None),
+    flush_interval=getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0),
+)
+
+
+class _SqlTimer:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, sql, seconds):
+        self.seconds += seconds
+        self.count += 1
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        sql_observers.install_existing()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timer = _SqlTimer()
+        start = time.perf_counter()
+        with sql_observers.observing(timer):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    async def __acall__(self, request):
+        # Queries run in worker threads; the observer follows the request's context
+        timer = _SqlTimer()
+        start = time.perf_counter()
+        with sql_observers.observing(timer):
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    def record(self, request, response, elapsed, timer):
+        match = request.resolver_match
+        route = match.view_name if match is not None else UNMATCHED_ROUTE
+        if response.streaming:
+            size = int(response['Content-Length']) if response.has_header('Content-Length') else None
+        else:
+            size = len(response.content)
+
+        registry.observe(route, request.method, elapsed, timer.count, timer.seconds,
+                         size, response.status_code)
+
+
+def _labels(route, method):
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'route="{route}",method="{method}"'
+
+
+def _histogram(lines, name, labels, buckets, counts, total):
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    cumulative += counts[-1]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {total}')
+    lines.append(f'{name}_count{{{labels}}} {cumulative}')
+
+
+def render(collected):
+    families = {
+        'requests': ['# HELP estore_http_requests_total Requests by route, method and status.',
+                     '# TYPE estore_http_requests_total counter'],
+        'latency': ['# HELP estore_http_request_duration_seconds Request latency.',
+                    '# TYPE estore_http_request_duration_seconds histogram'],
+        'queries': ['# HELP estore_http_db_queries SQL queries per request.',
+                    '# TYPE estore_http_db_queries histogram'],
+        'sql': ['# HELP estore_http_db_query_duration_seconds_total Time spent in SQL.',
+                '# TYPE estore_http_db_query_duration_seconds_total counter'],
+        'size': ['# HELP estore_http_response_size_bytes Response body size.',
+                 '# TYPE estore_http_response_size_bytes histogram'],
+    }
+    for (route, method), series in sorted(collected.items()):
+        labels = _labels(route, method)
+        for status, count in sorted(series.statuses.items()):
+            families['requests'].append(f'estore_http_requests_total{{{labels},status="{status}"}} {count}')
+        _histogram(families['latency'], 'estore_http_request_duration_seconds', labels,
+                   LATENCY_BUCKETS, series.latency, series.latency_sum)
+        _histogram(families['queries'], 'estore_http_db_queries', labels,
+                   QUERY_BUCKETS, series.queries, series.queries_sum)
+        families['sql'].append(f'estore_http_db_query_duration_seconds_total{{{labels}}} {series.sql_seconds}')
+        _histogram(families['size'], 'estore_http_response_size_bytes', labels,
+                   SIZE_BUCKETS, series.size, series.size_sum)
+
+    return '\n'.join(line for family in families.values() for line in family) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, protected by METRICS_TOKEN outside DEBUG."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(render(registry.collect()), content_type='text/plain; version=0.0.4')
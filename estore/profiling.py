@@ -0,0 +1,226 @@
+"""
+On-demand request profiling for staff.
+
+A staff user can ask for a profile of a single request by sending the
+``X-Profile: 1`` header or adding ``?_profile=1`` to the URL. The response
+body is then replaced by a JSON document holding the original response and a
+profile with cProfile hotspots, every SQL statement with its duration and
+origin, and the time split across authentication, queryset evaluation,
+serialization and rendering. A ``Server-Timing`` header carries the same split
+for browser dev tools. Under ASGI the profiled request is driven from a thread
+of its own, so other requests sharing the event loop stay out of its profile.
+
+Requests without the flag only pay for a header and query-string lookup.
+Profiling is off unless PROFILING_ENABLED is set (the settings turn it on
+with DEBUG), PROFILING_SAMPLE_RATE limits how many flagged requests are
+profiled, and only one request per process is profiled at a time.
+"""
+import cProfile
+import json
+import pstats
+import random
+import threading
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from estore import sql_observers
+from estore.query_budget import call_site, short_path
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+
+# Functions whose cumulative time makes up each phase. Queryset evaluation
+# usually happens lazily inside serialization, so those two overlap.
+PHASES = {
+    'authentication': [('rest_framework/request.py', '_authenticate')],
+    'queryset': [('django/db/models/query.py', '_fetch_all')],
+    'serialization': [('rest_framework/serializers.py', 'data')],
+    'rendering': [('rest_framework/response.py', 'rendered_content')],
+}
+
+_active = threading.Lock()
+
+
+def profile_requested(request):
+    if request.META.get(PROFILE_HEADER) == '1':
+        return True
+    query_string = request.META.get('QUERY_STRING', '')
+    return PROFILE_PARAM in query_string and request.GET.get(PROFILE_PARAM) == '1'
+
+
+def is_staff(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return result is not None and result[0].is_staff
+
+
+class SqlLog:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, sql, seconds):
+        # Runs on the thread that executed the statement, so the stack is its own
+        self.statements.append({
+            'sql': sql,
+            'duration_ms': round(seconds * 1000, 3),
+            'origin': call_site(),
+        })
+
+
+class ProfileSession:
+    """
+    Profiles whatever runs inside the ``with`` block on the current thread,
+    and the SQL issued on behalf of it on any thread.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.sql = SqlLog()
+
+    def __enter__(self):
+        self.observing = sql_observers.observing(self.sql)
+        self.observing.__enter__()
+        self.start = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.elapsed = time.perf_counter() - self.start
+        self.observing.__exit__(*exc_info)
+        _active.release()
+
+    def phases(self, stats):
+        totals = dict.fromkeys(PHASES, 0.0)
+        for (filename, _, function), (_, _, _, cumulative, _) in stats.stats.items():
+            filename = filename.replace('\\', '/')
+            for phase, targets in PHASES.items():
+                for suffix, name in targets:
+                    if function == name and filename.endswith(suffix):
+                        # Nested serializers re-enter ``data``; keep the outermost
+                        totals[phase] = max(totals[phase], cumulative)
+        return {phase: round(seconds * 1000, 3) for phase, seconds in totals.items()}
+
+    def hotspots(self, stats, sort_key, limit):
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][sort_key], reverse=True)
+        return [
+            {
+                'function': f'{short_path(filename)}:{lineno}({function})',
+                'calls': calls,
+                'tottime_ms': round(tottime * 1000, 3),
+                'cumtime_ms': round(cumtime * 1000, 3),
+            }
+            for (filename, lineno, function), (_, calls, tottime, cumtime, _) in rows[:limit]
+        ]
+
+    def report(self):
+        stats = pstats.Stats(self.profiler)
+        limit = getattr(settings, 'PROFILING_TOP_FUNCTIONS', 25)
+        return {
+            'total_ms': round(self.elapsed * 1000, 3),
+            'phases_ms': self.phases(stats),
+            'sql': {
+                'count': len(self.sql.statements),
+                'total_ms': round(sum(s['duration_ms'] for s in self.sql.statements), 3),
+                'statements': self.sql.statements,
+            },
+            'hotspots': {
+                'cumulative': self.hotspots(stats, 3, limit),
+                'internal': self.hotspots(stats, 2, limit),
+            },
+        }
+
+    def attach(self, response):
+        profile = self.report()
+        timings = dict(profile['phases_ms'], sql=profile['sql']['total_ms'], total=profile['total_ms'])
+
+        content_type = response.get('Content-Type', '')
+        if response.streaming:
+            body = None
+        elif content_type.startswith('application/json'):
+            body = json.loads(response.content or 'null')
+        else:
+            body = response.content.decode(response.charset, errors='replace')
+
+        profiled = JsonResponse(
+            {
+                'profile': profile,
+                'response': {
+                    'status_code': response.status_code,
+                    'content_type': content_type,
+                    'body': body,
+                },
+            },
+            status=response.status_code,
+            encoder=JSONEncoder,
+        )
+        profiled['Server-Timing'] = ', '.join(f'{name};dur={ms}' for name, ms in timings.items())
+        return profiled
+
+
+def start_session():
+    """Return a ProfileSession, or None if sampled out or another profile is running."""
+    if random.random() >= getattr(settings, 'PROFILING_SAMPLE_RATE', 0.01):
+        return None
+    if not _active.acquire(blocking=False):
+        return None
+    return ProfileSession()
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not (self.enabled and profile_requested(request) and is_staff(request)):
+            return self.get_response(request)
+
+        session = start_session()
+        if session is None:
+            return self.get_response(request)
+        with session:
+            response = self.get_response(request)
+        return session.attach(response)
+
+    async def __acall__(self, request):
+        if not (self.enabled and profile_requested(request)
+                and await sync_to_async(is_staff)(request)):
+            return await self.get_response(request)
+
+        session = start_session()
+        if session is None:
+            return await self.get_response(request)
+        # cProfile follows the thread that enables it, and the event loop is
+        # shared with every other request in flight. Profile from a thread of
+        # our own instead: async_to_sync hands the coroutine back to the loop
+        # and runs its sync work (DRF views, ORM calls) on this thread.
+        return await sync_to_async(self.profile_in_thread, thread_sensitive=False)(session, request)
+
+    def profile_in_thread(self, session, request):
+        try:
+            with session:
+                response = async_to_sync(self.get_response)(request)
+            return session.attach(response)
+        finally:
+            close_old_connections()
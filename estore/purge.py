@@ -0,0 +1,26 @@
+"""
+Chunked deletes for housekeeping commands.
+
+Deleting every matching row in one statement holds locks on the table (and on
+rows cascaded to) for as long as the whole delete takes. ``delete_in_batches``
+lists a batch of primary keys through the queryset's own filter, which should
+be backed by an index, and deletes that batch in its own short statement.
+"""
+from collections import Counter
+
+
+def delete_in_batches(queryset, batch_size=1000):
+    """
+    Delete the rows of ``queryset`` ``batch_size`` at a time. Return the total
+    and the per-model counts, like ``QuerySet.delete()``.
+    """
+    total = 0
+    per_model = Counter()
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return total, dict(per_model)
+        # Repeat the filter so a row that stopped matching since it was listed survives
+        deleted, counts = queryset.filter(pk__in=pks).delete()
+        total += deleted
+        per_model.update(counts)
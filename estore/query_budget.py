@@ -0,0 +1,145 @@
+"""
+Query budgets for tests.
+
+Wrap a request in ``assert_query_budget`` (or use ``QueryBudgetMixin`` on a
+TestCase) to fail when it issues more SQL statements, or spends more time in
+the database, than the endpoint is allowed. The failure message groups the
+offending SQL by the code that triggered it, which is usually enough to spot
+the serializer field or loop behind an N+1 regression.
+"""
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.fields import Field
+from rest_framework.serializers import ListSerializer
+
+# Frames from these locations are plumbing, never the cause of a query
+_IGNORED_PATHS = (
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiling.py'),
+    os.sep + os.path.join('django', 'db') + os.sep,
+    os.sep + os.path.join('django', 'test') + os.sep,
+    os.sep + os.path.join('django', 'utils', 'asyncio.py'),
+)
+_PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+    """execute_wrapper that records each statement with its duration and origin."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries.append((sql, duration, call_site()))
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration, _ in self.queries)
+
+    def by_call_site(self):
+        groups = defaultdict(list)
+        for sql, duration, site in self.queries:
+            groups[site].append((sql, duration))
+        return sorted(groups.items(), key=lambda item: len(item[1]), reverse=True)
+
+
+def call_site():
+    """
+    Describe where a query came from: the innermost project frame, the
+    innermost library frame when it differs, and the serializer field being
+    rendered, if any.
+    """
+    project_frame = library_frame = field = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not any(ignored in filename for ignored in _IGNORED_PATHS):
+            if field is None:
+                field = _serializer_field(frame)
+            if filename.startswith(_PROJECT_ROOT) and 'site-packages' not in filename:
+                project_frame = frame
+                break
+            if library_frame is None:
+                library_frame = frame
+        frame = frame.f_back
+
+    parts = [_describe(frame) for frame in (project_frame, library_frame) if frame is not None]
+    site = ' via '.join(parts) or '<unknown>'
+    return f'{site} [{field}]' if field else site
+
+
+def _serializer_field(frame):
+    instance = frame.f_locals.get('self')
+    if isinstance(instance, Field) and instance.field_name and instance.parent is not None:
+        parent = instance.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent or parent
+        return f'{type(parent).__name__}.{instance.field_name}'
+    return None
+
+
+def short_path(filename):
+    """Trim a source path to its package-relative or project-relative part."""
+    if 'site-packages' in filename:
+        return filename.rsplit('site-packages' + os.sep, 1)[-1]
+    if filename.startswith(_PROJECT_ROOT):
+        return filename[len(_PROJECT_ROOT):]
+    return filename
+
+
+def _describe(frame):
+    return f'{short_path(frame.f_code.co_filename)}:{frame.f_lineno} in {frame.f_code.co_name}'
+
+
+def format_report(recorder, max_queries, max_time_ms):
+    lines = [
+        f'{len(recorder.queries)} queries in {recorder.total_time * 1000:.1f} ms '
+        f'(budget: {max_queries} queries'
+        + (f', {max_time_ms} ms' if max_time_ms is not None else '')
+        + ')',
+    ]
+    for site, queries in recorder.by_call_site():
+        elapsed = sum(duration for _, duration in queries) * 1000
+        lines.append(f'\n{len(queries)}x from {site} ({elapsed:.1f} ms)')
+        distinct = list(dict.fromkeys(sql for sql, _ in queries))
+        for sql in distinct[:3]:
+            lines.append(f'    {sql}')
+        if len(distinct) > 3:
+            lines.append(f'    ... and {len(distinct) - 3} more distinct statements')
+    return '\n'.join(lines)
+
+
+@contextmanager
+def assert_query_budget(max_queries, max_time_ms=None, using='default'):
+    """Fail if the block runs more than max_queries or spends more than max_time_ms in SQL."""
+    recorder = QueryRecorder()
+    with connections[using].execute_wrapper(recorder):
+        yield recorder
+
+    over_count = len(recorder.queries) > max_queries
+    over_time = max_time_ms is not None and recorder.total_time * 1000 > max_time_ms
+    if over_count or over_time:
+        raise QueryBudgetExceeded(format_report(recorder, max_queries, max_time_ms))
+
+
+class QueryBudgetMixin:
+    """TestCase mixin exposing assert_query_budget as self.assertQueryBudget."""
+
+    def assertQueryBudget(self, max_queries, max_time_ms=None, using='default'):
+        return assert_query_budget(max_queries, max_time_ms, using)
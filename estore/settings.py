@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+from corsheaders.defaults import default_headers
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,23 +50,78 @@ INSTALLED_APPS = [
     'products',
     'orders',
     'cart',
+    'benchmarks',
+    'tasks',
+    'idempotency',
 ]
 
 MIDDLEWARE = [
+    'estore.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'estore.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
 ]
 
+# Prometheus metrics (see estore/metrics.py). Point METRICS_MULTIPROC_DIR at a
+# directory shared by all worker processes when running more than one. The
+# scraper must send METRICS_TOKEN as a bearer token; without one /metrics is
+# only served with DEBUG on.
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+METRICS_FLUSH_INTERVAL = 5.0
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# On-demand profiling for staff (see estore/profiling.py). On by default only
+# with DEBUG; in production set PROFILING_ENABLED=1 and keep the sample rate low.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '1' if DEBUG else '0') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '1.0' if DEBUG else '0.01'))
+PROFILING_TOP_FUNCTIONS = 25
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'estore.throttling.RouteRateThrottle',
+    ),
+    # Reverse proxies in front of the app. Rate limits key on the address the
+    # outermost of them saw; with 0 they use REMOTE_ADDR and ignore
+    # client-supplied X-Forwarded-For.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Rate limits by route name (optionally prefixed with a method) and scope (see
+# estore/throttling.py). Counters are kept in the 'throttle' cache, a database
+# table shared by all worker processes; set THROTTLE_REDIS_URL (needs the redis
+# package) to move them to Redis. THROTTLE_DISABLED=1 turns limits off (e.g.
+# for load tests).
+THROTTLE_RATES = {} if os.environ.get('THROTTLE_DISABLED') else {
+    'product-list': {'user': '120/min', 'ip': '300/min'},
+    'async-product-list': {'ip': '300/min'},
+    'product-autocomplete': {'ip': '600/min'},
+    'jwt-create': {'ip': '10/min'},
+    'POST customuser-list': {'ip': '20/hour'},
+    'cart-add-item': {'user': '60/min'},
+    'order-create-from-cart': {'user': '10/min', 'ip': '30/min'},
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['THROTTLE_REDIS_URL'],
+    } if os.environ.get('THROTTLE_REDIS_URL') else {
+        # Shared by every worker; create it with `manage.py createcachetable`
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'throttle_cache',
+    },
 }
 
 SIMPLE_JWT = {
@@ -91,6 +147,7 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 CORS_ALLOW_METHODS = ["GET", "POST", "OPTIONS", "PUT", "PATCH", "DELETE"]
+CORS_ALLOW_HEADERS = [*default_headers, "idempotency-key"]
 CORS_ALLOW_CREDENTIALS = True
 
 ROOT_URLCONF = 'estore.urls'
@@ -113,12 +170,58 @@ TEMPLATES = [
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Media delivery (see estore/media.py). Set MEDIA_SENDFILE to 'nginx' or
+# 'apache' to let the front proxy stream files instead of a Python worker.
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 3600
+
+# Background threads per process that resize uploads (see estore/images.py);
+# 0 resizes inline when the upload commits
+IMAGE_VARIANT_WORKERS = 2
+
+# Seconds a catalog change must age before the changes/ feed serves it (see
+# CatalogChangesView); keep it above the longest catalog write transaction
+CATALOG_CHANGES_VISIBILITY_DELAY = 5
+
+# Product name autocomplete (see products/typeahead.py): seconds between
+# catch-ups from the catalog change log, and between popularity reloads
+TYPEAHEAD_SYNC_INTERVAL = 5.0
+TYPEAHEAD_REBUILD_INTERVAL = 3600
+
+# Background tasks (see tasks/queue.py): seconds before a RUNNING task whose
+# worker went silent is handed to another worker, and how long finished
+# tasks are kept
+TASKS_VISIBILITY_TIMEOUT = 300
+TASKS_KEEP_DONE_DAYS = 7
+
+# Idempotency-Key handling (see idempotency/decorators.py): how long keys are
+# remembered, how long a retry waits for the original request, and when an
+# unfinished original is presumed dead
+IDEMPOTENCY_TTL = 24 * 60 * 60
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# POST /api/batch/ limits (see estore/batch.py)
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_CONCURRENCY = 4
+
+# Order archival (see orders/archive.py): days a delivered or cancelled order
+# stays in the live tables after its last update
+ORDERS_ARCHIVE_AFTER_DAYS = 365
+
+# Days without a change after which purge_abandoned_carts deletes a cart
+CART_ABANDONED_AFTER_DAYS = 30
 STATIC_URL = '/static/'
 
 WSGI_APPLICATION = 'estore.wsgi.application'
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
+# Keeps rate-limit counters in memory under test (see estore/test_runner.py)
+TEST_RUNNER = 'estore.test_runner.TestRunner'
+
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
@@ -138,7 +241,15 @@ DJOSER = {
     'USER_CREATE_PASSWORD_RETYPE': True,  # Requires password confirmation
     'PASSWORD_RESET_CONFIRM_RETYPE': True,
     'SET_PASSWORD_RETYPE': True,
-
+    # Delivered by the background task queue (run_tasks)
+    'EMAIL': {
+        'activation': 'accounts.email.ActivationEmail',
+        'confirmation': 'accounts.email.ConfirmationEmail',
+        'password_reset': 'accounts.email.PasswordResetEmail',
+        'password_changed_confirmation': 'accounts.email.PasswordChangedConfirmationEmail',
+        'username_changed_confirmation': 'accounts.email.UsernameChangedConfirmationEmail',
+        'username_reset': 'accounts.email.UsernameResetEmail',
+    },
 }
 
 # Password validation
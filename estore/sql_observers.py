@@ -0,0 +1,63 @@
+"""
+Per-request SQL observation that follows the request across threads.
+
+``connection.execute_wrapper()`` only sees the connection of the thread that
+installs it, and Django keeps one connection per thread. Under ASGI the ORM
+runs in sync_to_async worker threads, so a wrapper installed by middleware on
+the event-loop thread never sees a query.
+
+Instead ``track`` is installed once on every connection as it is opened, and
+``observing`` registers a callback for the current request in a context
+variable. asgiref runs sync code in a copy of the caller's context, so every
+statement is reported to the callbacks of the request that issued it,
+whichever thread runs it.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_observers = contextvars.ContextVar('sql_observers', default=())
+
+
+def track(execute, sql, params, many, context):
+    observers = _observers.get()
+    if not observers:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - start
+        for observer in observers:
+            observer(sql, seconds)
+
+
+def install(connection):
+    if track not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track)
+
+
+def install_existing():
+    """Cover this thread's connections opened before this module was imported."""
+    for connection in connections.all():
+        install(connection)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+
+@contextmanager
+def observing(observer):
+    """Call ``observer(sql, seconds)`` for each statement run on behalf of this block."""
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield
+    finally:
+        _observers.reset(token)
@@ -0,0 +1,28 @@
+"""
+Test runner that keeps rate-limit counters out of the test database.
+
+The ``throttle`` cache is a database table by default, so every throttled
+request would add its counter reads and writes to the query budgets of the
+views under test. The counters go to a local-memory cache for the run
+instead; RateLimitTests switches back to the database cache where the
+backend itself is under test.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_databases(self, **kwargs):
+        # Created first so the database-backed cache table exists for the tests that use it
+        databases = super().setup_databases(**kwargs)
+        self.throttle_cache = override_settings(CACHES={
+            **settings.CACHES,
+            'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle'},
+        })
+        self.throttle_cache.enable()
+        return databases
+
+    def teardown_databases(self, old_config, **kwargs):
+        self.throttle_cache.disable()
+        super().teardown_databases(old_config, **kwargs)
@@ -0,0 +1,566 @@
+import io
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import CustomUser
+from products.models import Category, Product
+from . import images, metrics
+from .query_budget import QueryBudgetMixin
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Garden')
+        Product.objects.create(name='Rake', description='', price=Decimal('9.00'), category=category, stock=3)
+
+    def series(self, route, method='GET'):
+        data = metrics.Series()
+        with metrics.registry.lock:
+            if (route, method) in metrics.registry.series:
+                data.merge(metrics.registry.series[(route, method)].to_dict())
+        return data
+
+    def assert_recorded(self, route, before, queries):
+        after = self.series(route)
+        self.assertEqual(sum(after.statuses.values()) - sum(before.statuses.values()), 1)
+        self.assertEqual(after.queries_sum - before.queries_sum, queries)
+        self.assertGreater(after.sql_seconds, before.sql_seconds)
+        self.assertGreater(after.size_sum, before.size_sum)
+
+    def test_sync_request_counters(self):
+        before = self.series('product-list')
+        self.client.get('/api/products/products/')
+        self.assert_recorded('product-list', before, queries=1)
+
+    async def test_async_request_counts_queries_in_worker_threads(self):
+        before = self.series('async-product-list')
+        await self.async_client.get('/api/products/async/products/')
+        self.assert_recorded('async-product-list', before, queries=1)
+
+    def test_unmatched_route(self):
+        before = self.series(metrics.UNMATCHED_ROUTE)
+        self.client.get('/no-such-page/')
+        after = self.series(metrics.UNMATCHED_ROUTE)
+        self.assertEqual(after.statuses.get(404, 0) - before.statuses.get(404, 0), 1)
+
+    def test_render_format(self):
+        registry = metrics.Registry()
+        registry.observe('product-list', 'GET', 0.02, 3, 0.004, 2000, 200)
+        registry.observe('product-list', 'GET', 0.3, 0, 0.0, 100, 404)
+        lines = metrics.render(registry.collect()).splitlines()
+
+        labels = 'route="product-list",method="GET"'
+        for line in [
+            '# TYPE estore_http_requests_total counter',
+            f'estore_http_requests_total{{{labels},status="200"}} 1',
+            f'estore_http_requests_total{{{labels},status="404"}} 1',
+            '# TYPE estore_http_request_duration_seconds histogram',
+            f'estore_http_request_duration_seconds_bucket{{{labels},le="0.025"}} 1',
+            f'estore_http_request_duration_seconds_bucket{{{labels},le="0.5"}} 2',
+            f'estore_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+            f'estore_http_request_duration_seconds_count{{{labels}}} 2',
+            f'estore_http_db_queries_bucket{{{labels},le="0"}} 1',
+            f'estore_http_db_queries_sum{{{labels}}} 3',
+            f'estore_http_db_query_duration_seconds_total{{{labels}}} 0.004',
+            f'estore_http_response_size_bytes_sum{{{labels}}} 2100',
+        ]:
+            self.assertIn(line, lines)
+
+    def test_label_escaping(self):
+        self.assertEqual(metrics._labels('a"b\\c', 'GET'), 'route="a\\"b\\\\c",method="GET"')
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_scrape_endpoint(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(DEBUG=True):
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'# TYPE estore_http_requests_total counter', response.content)
+
+        with override_settings(METRICS_TOKEN='secret', DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+
+    def shared_registry(self, directory):
+        registry = metrics.Registry(directory, flush_interval=3600)
+        # Stop the flush thread and the exit hook writing once the directory is gone
+        self.addCleanup(setattr, registry, 'path', None)
+        return registry
+
+    def test_multiprocess_snapshots(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # Two workers that were handed the same pid each keep their own file
+        first, second = self.shared_registry(directory), self.shared_registry(directory)
+        first.observe('product-list', 'GET', 0.01, 1, 0.001, 100, 200)
+        second.observe('product-list', 'GET', 0.01, 1, 0.001, 100, 200)
+        second.flush()
+        self.assertNotEqual(first.path, second.path)
+        self.assertEqual(first.collect()[('product-list', 'GET')].statuses, {200: 2})
+
+        # A worker that has exited is folded into the retired totals
+        dead = metrics.Registry()
+        dead.observe('product-list', 'GET', 0.01, 1, 0.001, 100, 500)
+        metrics._write_json(os.path.join(directory, 'metrics-999999999-0a.json'), metrics._snapshot(dead.series))
+        for _ in range(2):
+            self.assertEqual(first.collect()[('product-list', 'GET')].statuses, {200: 2, 500: 1})
+        self.assertCountEqual(
+            os.listdir(directory),
+            ['.lock', metrics.RETIRED_NAME, os.path.basename(first.path), os.path.basename(second.path)],
+        )
+
+
+def server_timing(response):
+    return {
+        name: float(duration.split('=')[1])
+        for name, duration in (part.split(';') for part in response['Server-Timing'].split(', '))
+    }
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user(email='staff@example.com', username='staff', is_staff=True)
+        cls.shopper = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        category = Category.objects.create(name='Garden')
+        Product.objects.create(name='Rake', description='', price=Decimal('9.00'), category=category, stock=3)
+
+    def get(self, path, user=None, **extra):
+        if user is not None:
+            extra['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(user)}'
+        return self.client.get(path, **extra)
+
+    def test_staff_opt_in_by_flag_or_header(self):
+        for extra, path in [({}, '/api/products/products/?_profile=1'),
+                            ({'HTTP_X_PROFILE': '1'}, '/api/products/products/')]:
+            with self.subTest(path=path, **extra):
+                response = self.get(path, self.staff, **extra)
+                self.assertEqual(response.status_code, 200)
+                body = response.json()
+                self.assertEqual(body['response']['body'][0]['name'], 'Rake')
+                profile = body['profile']
+                self.assertEqual(profile['sql']['count'], len(profile['sql']['statements']))
+                self.assertGreaterEqual(profile['sql']['count'], 1)
+                self.assertTrue(all(statement['origin'] for statement in profile['sql']['statements']))
+                self.assertGreater(profile['phases_ms']['serialization'], 0)
+                self.assertTrue(profile['hotspots']['cumulative'])
+
+                timing = server_timing(response)
+                self.assertEqual(
+                    set(timing), {'authentication', 'queryset', 'serialization', 'rendering', 'sql', 'total'}
+                )
+                self.assertEqual(timing['sql'], profile['sql']['total_ms'])
+                self.assertEqual(timing['total'], profile['total_ms'])
+
+    def test_not_profiled_without_staff_and_flag(self):
+        for user, path in [(None, '/api/products/products/?_profile=1'),
+                           (self.shopper, '/api/products/products/?_profile=1'),
+                           (self.staff, '/api/products/products/'),
+                           (self.staff, '/api/products/products/?_profile=0')]:
+            with self.subTest(user=user, path=path):
+                response = self.get(path, user)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('Server-Timing'))
+                self.assertEqual(response.json()[0]['name'], 'Rake')
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        response = self.get('/api/products/products/?_profile=1', self.staff)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0)
+    def test_sampled_out(self):
+        response = self.get('/api/products/products/?_profile=1', self.staff)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0)
+class AsyncProfilingTests(TransactionTestCase):
+    # The profiled request runs on its own thread and database connection,
+    # so its data has to be committed.
+
+    def setUp(self):
+        self.staff = CustomUser.objects.create_user(email='staff@example.com', username='staff', is_staff=True)
+        Category.objects.create(name='Garden')
+
+    async def test_profiles_request_under_asgi(self):
+        response = await self.async_client.get(
+            '/api/products/categories/?_profile=1',
+            headers={'Authorization': f'Bearer {AccessToken.for_user(self.staff)}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        profile = response.json()['profile']
+        self.assertEqual(response.json()['response']['body'][0]['name'], 'Garden')
+        self.assertGreaterEqual(profile['sql']['count'], 1)
+        timing = server_timing(response)
+        self.assertGreater(timing['sql'], 0)
+        self.assertGreater(timing['serialization'], 0)
+        self.assertGreater(timing['rendering'], 0)
+
+
+def png(width, height, name='photo.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class MediaRootMixin:
+    """Point MEDIA_ROOT at a throwaway directory for the test."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+@override_settings(IMAGE_VARIANT_WORKERS=0)
+class ImageVariantTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Garden')
+
+    def create_product(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                name='Rake', description='', price=Decimal('9.00'), category=self.category, stock=3, image=upload
+            )
+
+    def test_build_variants(self):
+        source = default_storage.save('product_images/photo.png', png(1200, 600))
+        result = images.build_variants(source)
+
+        digest = result['hash']
+        self.assertEqual(len(digest), images.HASH_LENGTH)
+        self.assertEqual(result['source'], source)
+        sizes = {variant: (entry['width'], entry['height']) for variant, entry in result['variants'].items()}
+        self.assertEqual(sizes, {'thumbnail': (150, 75), 'card': (400, 200), 'detail': (1000, 500)})
+        for variant, entry in result['variants'].items():
+            for extension, fmt in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+                self.assertEqual(entry[extension], f'product_images/variants/photo.{digest}.{variant}.{extension}')
+                with default_storage.open(entry[extension]) as fh, Image.open(fh) as image:
+                    self.assertEqual(image.format, fmt)
+                    self.assertEqual(image.size, sizes[variant])
+
+    def test_small_images_are_not_upscaled(self):
+        source = default_storage.save('product_images/small.png', png(120, 90))
+        variants = images.build_variants(source)['variants']
+        self.assertEqual({(entry['width'], entry['height']) for entry in variants.values()}, {(120, 90)})
+
+    def test_upload_generates_variants_and_serializer_srcset(self):
+        product = self.create_product(png(1200, 600))
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['source'], product.image.name)
+
+        variants = APIClient().get(f'/api/products/products/{product.pk}/').json()['image_variants']
+        digest = product.image_variants['hash']
+        stem = product.image.name.rsplit('/', 1)[1].rsplit('.', 1)[0]
+        base = f'http://testserver/media/product_images/variants/{stem}.{digest}'
+        self.assertEqual(variants['thumbnail'], {
+            'width': 150, 'height': 75,
+            'webp': f'{base}.thumbnail.webp', 'jpeg': f'{base}.thumbnail.jpeg',
+        })
+        self.assertEqual(
+            variants['srcset']['webp'],
+            f'{base}.thumbnail.webp 150w, {base}.card.webp 400w, {base}.detail.webp 1000w'
+        )
+        self.assertEqual(
+            variants['srcset']['jpeg'],
+            f'{base}.thumbnail.jpeg 150w, {base}.card.jpeg 400w, {base}.detail.jpeg 1000w'
+        )
+
+    def test_unchanged_and_removed_images(self):
+        product = self.create_product(png(800, 800))
+        product.refresh_from_db()
+        stored = product.image_variants
+
+        # Saving without touching the image keeps the variants as they are
+        with mock.patch.object(images, '_submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            product.stock = 4
+            product.save()
+        submit.assert_not_called()
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants, stored)
+
+        product.image = None
+        product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants, {})
+        self.assertIsNone(APIClient().get(f'/api/products/products/{product.pk}/').json()['image_variants'])
+
+    def test_profile_picture_variants(self):
+        user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.profile_picture = png(600, 900, 'me.png')
+            user.save()
+        user.refresh_from_db()
+        sizes = {
+            variant: (entry['width'], entry['height'])
+            for variant, entry in user.profile_picture_variants['variants'].items()
+        }
+        self.assertEqual(sizes, {'thumbnail': (100, 150), 'card': (267, 400), 'detail': (600, 900)})
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        variants = client.get('/api/accounts/users/me/').json()['profile_picture_variants']
+        self.assertTrue(variants['srcset']['webp'].endswith('.detail.webp 600w'))
+
+
+class MediaServingTests(MediaRootMixin, TestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        default_storage.save('docs/manual.bin', io.BytesIO(self.content))
+
+    def test_whole_file(self):
+        response = self.client.get('/media/docs/manual.bin')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+    def test_byte_ranges(self):
+        for header, start, end in [
+            ('bytes=10-19', 10, 19),
+            ('bytes=1000-', 1000, 1023),
+            ('bytes=-24', 1000, 1023),
+            ('bytes=1000-5000', 1000, 1023),
+        ]:
+            with self.subTest(header):
+                response = self.client.get('/media/docs/manual.bin', HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/1024')
+                self.assertEqual(response['Content-Length'], str(end - start + 1))
+                self.assertEqual(b''.join(response.streaming_content), self.content[start:end + 1])
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=1024-', 'bytes=20-10', 'bytes=-0'):
+            with self.subTest(header):
+                response = self.client.get('/media/docs/manual.bin', HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_unparsable_or_stale_range_sends_whole_file(self):
+        etag = self.client.get('/media/docs/manual.bin')['ETag']
+        for headers in (
+            {'HTTP_RANGE': 'bytes=0-1,5-6'},
+            {'HTTP_RANGE': 'bytes=0-9', 'HTTP_IF_RANGE': '"stale"'},
+        ):
+            with self.subTest(headers):
+                response = self.client.get('/media/docs/manual.bin', **headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(b''.join(response.streaming_content), self.content)
+        response = self.client.get('/media/docs/manual.bin', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_conditional_requests(self):
+        first = self.client.get('/media/docs/manual.bin')
+        response = self.client.get('/media/docs/manual.bin', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+        response = self.client.get('/media/docs/manual.bin', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/media/docs/manual.bin', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_hashed_variant_names_are_immutable(self):
+        default_storage.save('product_images/variants/photo.0123456789ab.thumb.webp', io.BytesIO(b'x'))
+        response = self.client.get('/media/product_images/variants/photo.0123456789ab.thumb.webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    @override_settings(MEDIA_SENDFILE='nginx', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_nginx_accel_redirect(self):
+        response = self.client.get('/media/docs/manual.bin', HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/docs/manual.bin')
+        self.assertEqual(response.content, b'')
+        self.assertTrue(response['ETag'])
+
+    @override_settings(MEDIA_SENDFILE='apache')
+    def test_apache_sendfile(self):
+        response = self.client.get('/media/docs/manual.bin')
+        self.assertEqual(response['X-Sendfile'], default_storage.path('docs/manual.bin'))
+
+    def test_rejects_paths_outside_media_root(self):
+        outer = settings.MEDIA_ROOT
+        with open(os.path.join(outer, 'secret.txt'), 'w') as fh:
+            fh.write('secret')
+        with override_settings(MEDIA_ROOT=os.path.join(outer, 'public')):
+            os.mkdir(settings.MEDIA_ROOT)
+            for path in ('/media/../secret.txt', '/media/%2e%2e/secret.txt', f'/media/{outer}/secret.txt'):
+                with self.subTest(path):
+                    self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_missing_files_directories_and_methods(self):
+        self.assertEqual(self.client.get('/media/docs/missing.bin').status_code, 404)
+        self.assertEqual(self.client.get('/media/docs').status_code, 404)
+        self.assertEqual(self.client.post('/media/docs/manual.bin').status_code, 405)
+
+
+class BatchRequestTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def batch(self, *requests):
+        return self.client.post('/api/batch/', {'requests': list(requests)}, format='json')
+
+    def test_page_load(self):
+        with self.assertQueryBudget(6):
+            response = self.batch(
+                {'id': 'me', 'path': '/api/accounts/users/me/'},
+                {'id': 'cart', 'path': '/api/cart/'},
+                {'id': 'categories', 'path': '/api/products/categories/'},
+                {'id': 'products', 'path': '/api/products/products/?ordering=price'},
+            )
+        self.assertEqual(response.status_code, 200)
+        responses = response.json()['responses']
+        self.assertEqual([r['id'] for r in responses], ['me', 'cart', 'categories', 'products'])
+        self.assertEqual([r['status'] for r in responses], [200, 200, 200, 200])
+        self.assertEqual(responses[0]['body']['email'], 'shopper@example.com')
+
+    def test_sub_request_errors(self):
+        response = self.batch(
+            {'id': 'missing', 'path': '/api/nowhere/'},
+            {'id': 'nested', 'method': 'POST', 'path': '/api/batch/', 'body': {'requests': []}},
+            {'id': 'relative', 'path': 'api/cart/'},
+            {'id': 'anonymous-only', 'method': 'POST', 'path': '/api/products/products/', 'body': {}},
+        )
+        statuses = {r['id']: r['status'] for r in response.json()['responses']}
+        self.assertEqual(statuses, {'missing': 404, 'nested': 400, 'relative': 400, 'anonymous-only': 403})
+
+    def test_anonymous_and_invalid_token(self):
+        self.client.credentials()
+        response = self.batch({'id': 'me', 'path': '/api/accounts/users/me/'})
+        self.assertEqual(response.json()['responses'][0]['status'], 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(self.batch({'path': '/api/cart/'}).status_code, 401)
+
+    def test_request_limit(self):
+        with self.settings(BATCH_MAX_REQUESTS=2):
+            response = self.batch(*[{'path': '/api/cart/'}] * 3)
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(THROTTLE_RATES={
+    'jwt-create': {'ip': '3/min'},
+    'product-list': {'user': '2/min', 'ip': '3/min'},
+    'async-product-list': {'ip': '2/min'},
+    'POST customuser-list': {'ip': '2/hour'},
+})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        caches['throttle'].clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+
+    def test_login_budget_per_ip(self):
+        credentials = {'email': 'shopper@example.com', 'password': 'wrong'}
+        statuses = [self.client.post('/api/auth/jwt/create/', credentials).status_code for _ in range(4)]
+        self.assertEqual(statuses, [401, 401, 401, 429])
+
+        response = self.client.post('/api/auth/jwt/create/', credentials, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 401)
+
+    def test_user_and_ip_budgets(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        statuses = [self.client.get('/api/products/products/').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertIn('Retry-After', self.client.get('/api/products/products/'))
+
+        # Anonymous requests from the same address only have the IP budget left
+        self.client.credentials()
+        self.assertEqual(self.client.get('/api/products/products/').status_code, 429)
+
+    def test_unlisted_routes_are_not_counted(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        for _ in range(5):
+            self.assertEqual(self.client.get('/api/products/categories/').status_code, 200)
+
+    async def test_async_routes(self):
+        statuses = [(await self.async_client.get('/api/products/async/products/')).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = await self.async_client.get('/api/products/async/products/', {'search': 'kettle'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertIn('throttled', response.json()['detail'])
+
+        # Routes without a budget are not counted
+        self.assertEqual((await self.async_client.get('/api/products/async/categories/')).status_code, 200)
+
+    def test_spoofed_forwarded_for_does_not_reset_the_budget(self):
+        credentials = {'email': 'shopper@example.com', 'password': 'wrong'}
+        statuses = [
+            self.client.post('/api/auth/jwt/create/', credentials, HTTP_X_FORWARDED_FOR=f'203.0.113.{i}').status_code
+            for i in range(4)
+        ]
+        self.assertEqual(statuses, [401, 401, 401, 429])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_client_address_from_trusted_proxy(self):
+        credentials = {'email': 'shopper@example.com', 'password': 'wrong'}
+        for _ in range(3):
+            self.client.post('/api/auth/jwt/create/', credentials, HTTP_X_FORWARDED_FOR='203.0.113.1')
+        # The proxy appends the address it saw; anything before it is the client's own claim
+        blocked = self.client.post('/api/auth/jwt/create/', credentials, HTTP_X_FORWARDED_FOR='1.2.3.4, 203.0.113.1')
+        self.assertEqual(blocked.status_code, 429)
+        other = self.client.post('/api/auth/jwt/create/', credentials, HTTP_X_FORWARDED_FOR='203.0.113.2')
+        self.assertEqual(other.status_code, 401)
+
+    def test_method_scoped_budget(self):
+        staff = CustomUser.objects.create_user(email='staff@example.com', username='staff', is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(staff)}')
+        for _ in range(4):
+            self.assertEqual(self.client.get('/api/auth/users/').status_code, 200)
+
+        self.client.credentials()
+        statuses = [
+            self.client.post('/api/auth/users/', {
+                'email': f'new{i}@example.com', 'username': f'new{i}', 'password': 'a-long-passphrase-1',
+                're_password': 'a-long-passphrase-1',
+            }).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(statuses[2], 429)
+        self.assertNotIn(429, statuses[:2])
+
+    @override_settings(CACHES={
+        **settings.CACHES,
+        'throttle': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'throttle_cache'},
+    })
+    def test_database_cache(self):
+        caches['throttle'].clear()
+        statuses = [self.client.get('/api/products/products/').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM throttle_cache')
+            self.assertGreater(cursor.fetchone()[0], 0)
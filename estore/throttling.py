@@ -0,0 +1,136 @@
+"""
+Per-route rate limits kept in a shared cache.
+
+THROTTLE_RATES maps a route name (the URL pattern's view name, as used by the
+metrics) to the budgets that apply to it, per scope. A key may be prefixed
+with an HTTP method to limit only that method on the route; it takes
+precedence over the bare route name:
+
+    THROTTLE_RATES = {
+        'jwt-create': {'ip': '10/min'},
+        'POST customuser-list': {'ip': '20/hour'},  # signups, not the user list
+        'order-create-from-cart': {'user': '10/min', 'ip': '30/min'},
+    }
+
+``user`` budgets are counted per authenticated user (per client IP for
+anonymous requests), ``ip`` budgets per client IP. The client IP is DRF's
+``get_ident``: REMOTE_ADDR, or the X-Forwarded-For entry added by the
+nearest trusted proxy when REST_FRAMEWORK['NUM_PROXIES'] says how many sit in
+front of the app, so clients cannot pick their own address. Routes that are
+not listed are not throttled and cost two dict lookups.
+
+Counters live in the ``throttle`` cache alias, which every worker process
+must share: the database cache by default, Redis when THROTTLE_REDIS_URL is
+set. Django's cache API has no compare-and-set, which a token bucket needs,
+so each budget is a sliding window built from two fixed-window counters
+updated with ``incr`` (atomic on Redis; a read and a write on the database,
+where simultaneous requests can undercount slightly): the previous window's
+count is weighted by how much of it still overlaps the sliding window. Like
+a token bucket refilled at the same rate, this allows short bursts and then
+smooths to the configured rate.
+
+DRF applies the throttle to API views; plain async views (the catalog
+mirrors in products/async_views.py) opt in with the ``throttled`` decorator.
+"""
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+CACHE_ALIAS = 'throttle'
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+_parsed = {}
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60); also accepts '100/5m'."""
+    if rate not in _parsed:
+        count, period = rate.split('/')
+        multiplier = ''.join(char for char in period if char.isdigit()) or '1'
+        unit = period.lstrip('0123456789')
+        _parsed[rate] = (int(count), int(multiplier) * PERIODS[unit])
+    return _parsed[rate]
+
+
+def route_key(request):
+    """The THROTTLE_RATES key that applies to ``request``, or None."""
+    match = request.resolver_match
+    if match is None:
+        return None
+    rates = getattr(settings, 'THROTTLE_RATES', {})
+    for key in (f'{request.method} {match.view_name}', match.view_name):
+        if key in rates:
+            return key
+    return None
+
+
+class RouteRateThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        key = route_key(request)
+        if key is None:
+            return True
+        rules = settings.THROTTLE_RATES[key]
+
+        cache = caches[CACHE_ALIAS]
+        now = time.time()
+        ident = self.get_ident(request)
+        user = getattr(request, 'user', None)
+        counters = []
+        for scope, rate in rules.items():
+            limit, window = parse_rate(rate)
+            if scope == 'user' and user is not None and user.is_authenticated:
+                subject = f'u{user.pk}'
+            else:
+                subject = f'ip{ident}'
+            current = int(now // window)
+            prefix = f'throttle:{key}:{scope}:{subject}:'.replace(' ', '_')
+            counters.append((prefix, current, limit, window))
+
+        previous = cache.get_many([f'{prefix}{current - 1}' for prefix, current, _, _ in counters])
+        self.retry_after = None
+        for prefix, current, limit, window in counters:
+            count = self.increment(cache, f'{prefix}{current}', window)
+            elapsed = now - current * window
+            estimate = previous.get(f'{prefix}{current - 1}', 0) * (1 - elapsed / window) + count
+            if estimate > limit:
+                self.retry_after = max(self.retry_after or 0, window - elapsed)
+        return self.retry_after is None
+
+    @staticmethod
+    def increment(cache, key, window):
+        # Keys outlive their window so the next one can still weigh them
+        try:
+            return cache.incr(key)
+        except ValueError:
+            if cache.add(key, 1, timeout=window * 2 + 1):
+                return 1
+            return cache.incr(key)
+
+    def wait(self):
+        return self.retry_after
+
+
+def throttled(view):
+    """
+    Apply RouteRateThrottle to an async Django view, answering 429 with
+    Retry-After like DRF does. These views skip DRF authentication, so
+    ``user`` budgets count per client IP.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if route_key(request) is not None:
+            throttle = RouteRateThrottle()
+            # The cache client and the lazy request.user are synchronous
+            if not await sync_to_async(throttle.allow_request)(request, None):
+                exc = Throttled(throttle.wait())
+                response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+                response['Retry-After'] = str(exc.wait)
+                return response
+        return await view(request, *args, **kwargs)
+    return wrapper
@@ -60,9 +60,19 @@ interface Order {
     items: OrderItem[];
 }
 
+interface OrderPage {
+    count: number;
+    results: Order[];
+}
+
+const PAGE_SIZE = 20;
+
 export default function Orders() {
     const [orders, setOrders] = useState<Order[]>([]);
+    const [count, setCount] = useState<number>(0);
+    const [page, setPage] = useState<number>(1);
     const [isLoading, setIsLoading] = useState<boolean>(true);
+    const [isLoadingMore, setIsLoadingMore] = useState<boolean>(false);
     const [error, setError] = useState<string | null>(null);
 
     // Function to get auth headers
@@ -71,6 +81,30 @@ export default function Orders() {
         return token ? { Authorization: `Bearer ${token}` } : {};
     };
 
+    // Fetch one page of the order history, newest first
+    const fetchPage = async (pageNumber: number) => {
+        const response = await axios.get<OrderPage>(`${API_BASE_URL}/api/orders/`, {
+            headers: getAuthHeaders(),
+            params: { page: pageNumber, limit: PAGE_SIZE }
+        });
+        setCount(response.data.count);
+        setPage(pageNumber);
+        return response.data.results;
+    };
+
+    const loadMore = async () => {
+        setIsLoadingMore(true);
+        try {
+            const more = await fetchPage(page + 1);
+            setOrders(previous => [...previous, ...more]);
+        } catch (err) {
+            console.error('Error fetching orders:', err);
+            toast.error('Could not load more orders');
+        } finally {
+            setIsLoadingMore(false);
+        }
+    };
+
     // Fetch orders data
     useEffect(() => {
         const fetchOrders = async () => {
@@ -78,11 +112,7 @@ export default function Orders() {
             setError(null);
 
             try {
-                const response = await axios.get(`${API_BASE_URL}/api/orders/`, {
-                    headers: getAuthHeaders()
-                });
-
-                setOrders(response.data);
+                setOrders(await fetchPage(1));
             } catch (err) {
                 console.error('Error fetching orders:', err);
                 setError('Failed to load your orders. Please try again later.');
@@ -258,6 +288,14 @@ export default function Orders() {
                             </CardContent>
                         </Card>
                     ))}
+                    {orders.length < count && (
+                        <div className="flex justify-center">
+                            <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                                {isLoadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                                Load more orders
+                            </Button>
+                        </div>
+                    )}
                 </div>
             )}
         </div>
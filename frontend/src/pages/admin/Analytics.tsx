@@ -281,9 +281,13 @@ export default function Analytics() {
             totalProducts: products.length
           }));
 
-          // Fetch orders
-          const ordersResponse = await API.get('/api/orders/');
-          const orders = ordersResponse.data as OrderData[];
+          // Fetch every order, page by page
+          const orders: OrderData[] = [];
+          for (let page = 1; ; page++) {
+            const ordersResponse = await API.get('/api/orders/', { params: { page, limit: 100 } });
+            orders.push(...(ordersResponse.data.results as OrderData[]));
+            if (!ordersResponse.data.results.length || orders.length >= ordersResponse.data.count) break;
+          }
 
           // Calculate total revenue
           const totalRevenue = orders.reduce((sum, order) => sum + (Number(order.total_amount) || 0), 0);
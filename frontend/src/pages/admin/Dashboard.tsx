@@ -161,22 +161,19 @@ export default function Dashboard() {
             totalProducts: products.length
           }));
 
-          // Fetch orders
-          const ordersResponse = await API.get('/api/orders/');
-          const orders = ordersResponse.data as OrderData[];
+          // Fetch the five most recent orders (the API pages newest first)
+          const ordersResponse = await API.get('/api/orders/', { params: { limit: 5 } });
+          const orders = ordersResponse.data.results as OrderData[];
 
           // Process recent orders for the table
-          const recentOrdersData = orders
-              .sort((a, b) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime())
-              .slice(0, 5)
-              .map(order => ({
-                id: order.id,
-                user_email: order.user.email,
-                date: order.created_at,
-                total: order.total_amount,
-                status: order.status,
-                items: order.items.length
-              }));
+          const recentOrdersData = orders.map(order => ({
+            id: order.id,
+            user_email: order.user.email,
+            date: order.created_at,
+            total: order.total_amount,
+            status: order.status,
+            items: order.items.length
+          }));
           setRecentOrders(recentOrdersData);
 
         } catch (error) {
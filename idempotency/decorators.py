@@ -0,0 +1,132 @@
+"""
+Idempotency-Key support for unsafe API actions.
+
+A client that may retry a POST sends a unique ``Idempotency-Key`` header.
+The first request with a key claims it by inserting an IN_PROGRESS record,
+runs the view, and stores the response in the same transaction as the
+view's own writes. Retries with the same key then:
+
+* get the stored response replayed (``Idempotent-Replayed: true``) without
+  running the view again;
+* wait, up to IDEMPOTENCY_WAIT_TIMEOUT seconds, while the first request is
+  still running, then replay its response (409 if it does not finish);
+* get 422 if the method, path or body differ from the first request.
+
+Keys are scoped per user and kept for IDEMPOTENCY_TTL seconds. Server errors
+are not stored, so those requests can be retried. Requests without the
+header behave exactly as before.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(method, path, data):
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{method}\n{path}\n{body}'.encode()).hexdigest()
+
+
+def _acquire(user, key, digest):
+    """
+    Return (record, True) if this request now owns ``key``, else the existing
+    record (None if it kept changing under us) and False.
+    """
+    now = timezone.now()
+    abandoned = now - timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                record = IdempotencyRecord.objects.create(
+                    user=user, key=key, fingerprint=digest,
+                    expires_at=now + timedelta(seconds=getattr(settings, 'IDEMPOTENCY_TTL', 86400)),
+                )
+            return record, True
+        except IntegrityError:
+            record = IdempotencyRecord.objects.filter(user=user, key=key).first()
+            if record is None:
+                continue  # Deleted since our insert failed
+            stale = record.expires_at <= now or (
+                record.status == IdempotencyRecord.IN_PROGRESS and record.created_at < abandoned
+            )
+            if not stale:
+                return record, False
+            IdempotencyRecord.objects.filter(pk=record.pk, status=record.status).delete()
+    return None, False
+
+
+def _wait(record):
+    """Poll until the owning request finishes; None if it failed or took too long."""
+    deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 10)
+    interval = 0.05
+    while record.status == IdempotencyRecord.IN_PROGRESS:
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(interval)
+        interval = min(interval * 2, 0.5)
+        record = IdempotencyRecord.objects.filter(pk=record.pk).first()
+        if record is None:
+            return None
+    return record
+
+
+def idempotent(view):
+    """Honour the Idempotency-Key header on a viewset action (put it outermost)."""
+    @wraps(view)
+    def wrapper(viewset, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view(viewset, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        digest = fingerprint(request.method, request.path, request.data)
+        record, owner = _acquire(request.user, key, digest)
+        if not owner:
+            if record is not None and record.fingerprint != digest:
+                return Response(
+                    {'error': f'{HEADER} was already used for a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            record = _wait(record) if record is not None else None
+            if record is None:
+                return Response(
+                    {'error': 'A request with this key is still in progress'},
+                    status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'}
+                )
+            return Response(record.response_body, status=record.response_status,
+                            headers={'Idempotent-Replayed': 'true'})
+
+        try:
+            with transaction.atomic():
+                response = view(viewset, request, *args, **kwargs)
+                if response.status_code >= 500:
+                    transaction.set_rollback(True)
+                else:
+                    IdempotencyRecord.objects.filter(pk=record.pk).update(
+                        status=IdempotencyRecord.COMPLETED,
+                        response_status=response.status_code,
+                        response_body=response.data,
+                    )
+        except BaseException:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+        return response
+    return wrapper
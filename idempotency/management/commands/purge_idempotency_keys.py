@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from estore.purge import delete_in_batches
+from idempotency.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = 'Delete expired Idempotency-Key records in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        expired = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now())
+        deleted = delete_in_batches(expired, options['batch_size'])[0]
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} expired idempotency key(s).'))
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import CustomUser
+from cart.models import Cart, CartItem
+from orders.models import Order
+from products.models import Category, Product
+from .decorators import fingerprint
+from .models import IdempotencyRecord
+
+
+class IdempotencyKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        category = Category.objects.create(name='Kitchen')
+        cls.product = Product.objects.create(
+            name='Kettle', description='', price=Decimal('20.00'), category=category, stock=10
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def add_item(self, key, quantity=1):
+        return self.client.post(
+            '/api/cart/add_item/', {'product_id': self.product.pk, 'quantity': quantity},
+            format='json', headers={'Idempotency-Key': key}
+        )
+
+    def test_checkout_retry_is_replayed(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+
+        first = self.client.post('/api/orders/create_from_cart/', {}, format='json',
+                                 headers={'Idempotency-Key': 'checkout-1'})
+        retry = self.client.post('/api/orders/create_from_cart/', {}, format='json',
+                                 headers={'Idempotency-Key': 'checkout-1'})
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_add_item_retry_and_reuse(self):
+        self.add_item('add-1')
+        self.add_item('add-1')
+        self.assertEqual(CartItem.objects.get().quantity, 1)
+
+        self.assertEqual(self.add_item('add-1', quantity=3).status_code, 422)
+        self.assertEqual(self.add_item('add-2').status_code, 200)
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_in_progress_duplicate(self):
+        IdempotencyRecord.objects.create(
+            user=self.user, key='add-1', expires_at=timezone.now() + timedelta(hours=1),
+            fingerprint=fingerprint('POST', '/api/cart/add_item/', {'product_id': self.product.pk, 'quantity': 1}),
+        )
+        with self.settings(IDEMPOTENCY_WAIT_TIMEOUT=0.1):
+            self.assertEqual(self.add_item('add-1').status_code, 409)
+        self.assertFalse(CartItem.objects.exists())
+
+        # An original that never finished is taken over once presumed dead
+        IdempotencyRecord.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.add_item('add-1').status_code, 200)
+
+    def test_purge_expired(self):
+        IdempotencyRecord.objects.create(user=self.user, key='old', fingerprint='',
+                                         expires_at=timezone.now() - timedelta(seconds=1))
+        self.add_item('fresh')
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertEqual(list(IdempotencyRecord.objects.values_list('key', flat=True)), ['fresh'])
@@ -1,5 +1,6 @@
-from django.contrib import admin
-from .models import Order, OrderItem
+from django.contrib import admin, messages
+from .models import ArchivedOrder, Order, OrderItem
+from .transitions import transition
 
 class OrderItemInLine(admin.TabularInline):
     model = OrderItem
@@ -10,8 +11,46 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'status', 'payment_method', 'total_price', 'created_at')
     list_filter = ('status', 'payment_method', 'created_at')
     search_fields = [OrderItemInLine]
+    actions = ['mark_processing', 'mark_shipped', 'mark_delivered', 'mark_cancelled']
+
+    def apply_transition(self, request, queryset, status):
+        updated, skipped = transition(queryset, status)
+        self.message_user(request, f'{updated} order(s) marked {status.lower()}.')
+        if skipped:
+            self.message_user(
+                request, f'{len(skipped)} order(s) cannot move to {status.lower()} and were left unchanged.',
+                level=messages.WARNING
+            )
+
+    @admin.action(description='Mark selected orders as processing')
+    def mark_processing(self, request, queryset):
+        self.apply_transition(request, queryset, 'PROCESSING')
+
+    @admin.action(description='Mark selected orders as shipped')
+    def mark_shipped(self, request, queryset):
+        self.apply_transition(request, queryset, 'SHIPPED')
+
+    @admin.action(description='Mark selected orders as delivered')
+    def mark_delivered(self, request, queryset):
+        self.apply_transition(request, queryset, 'DELIVERED')
+
+    @admin.action(description='Mark selected orders as cancelled')
+    def mark_cancelled(self, request, queryset):
+        self.apply_transition(request, queryset, 'CANCELLED')
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('order', 'product', 'quantity', 'price')
     search_fields = ('order__id', 'product__name')
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'payment_method', 'total_price', 'created_at', 'archived_at')
+    list_filter = ('status', 'archived_at')
+    search_fields = ('order_number', 'user__email')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,67 @@
+"""
+Hot/cold storage for order history.
+
+Orders that are finished (delivered or cancelled) and have not changed for a
+while are only ever read again as history. ``archive`` moves them, with
+their items, from Order/OrderItem into ArchivedOrder/ArchivedOrderItem in
+chunks, so the live tables that checkout, staff listings and status filters
+work against only hold recent and open orders.
+
+Each chunk is copied and deleted in one transaction: an order is always in
+exactly one of the two tables. Archived rows keep their primary keys, which
+the live tables never hand out again, so an order id still identifies one
+order wherever it lives. OrderViewSet reads both tables (see orders/views.py).
+"""
+from django.db import transaction
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ARCHIVABLE_STATUSES = ('DELIVERED', 'CANCELLED')
+
+
+def archivable(before):
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=before)
+
+
+@transaction.atomic
+def archive_chunk(pks, before):
+    # Re-check under lock: an order may have been reopened since it was listed
+    orders = list(archivable(before).filter(pk__in=pks).select_for_update())
+    if not orders:
+        return 0
+    pks = [order.pk for order in orders]
+    ArchivedOrder.objects.bulk_create([
+        ArchivedOrder(
+            id=order.pk, user_id=order.user_id, created_at=order.created_at,
+            updated_at=order.updated_at, status=order.status,
+            payment_method=order.payment_method, total_price=order.total_price,
+            shipping_address_id=order.shipping_address_id,
+            order_number=order.order_number or f'ORD-{order.pk}',
+        )
+        for order in orders
+    ])
+    ArchivedOrderItem.objects.bulk_create([
+        ArchivedOrderItem(
+            id=item.pk, order_id=item.order_id, product_id=item.product_id,
+            quantity=item.quantity, price=item.price,
+        )
+        for item in OrderItem.objects.filter(order_id__in=pks)
+    ])
+    # Deleting the orders cascades to their items
+    Order.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def archive(before, batch_size=500):
+    """Move finished orders last updated before ``before`` to the archive; return how many."""
+    archived = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            archivable(before).filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return archived
+        last_pk = pks[-1]
+        archived += archive_chunk(pks, before)
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move delivered and cancelled orders, with their items, from the live '
+        'order tables to the archive tables in small transactions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int,
+                            default=getattr(settings, 'ORDERS_ARCHIVE_AFTER_DAYS', 365),
+                            help='Archive orders not updated for this many days')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Orders moved per transaction')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['older_than_days'])
+        moved = archive.archive(before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} order(s) last updated before {before:%Y-%m-%d}.'))
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Order, OrderItem, ShippingAddress
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, ShippingAddress
 from products.serializers import ProductSerializer
 from accounts.serializers import UserProfileSerializer  # Assuming you have this
 
@@ -30,3 +30,16 @@ class OrderSerializer(serializers.ModelSerializer):
             'id', 'order_number', 'user', 'created_at', 'updated_at',
             'status', 'payment_method', 'total_amount', 'shipping_address', 'items'
         ]
+
+
+class ArchivedOrderItemSerializer(OrderItemSerializer):
+    class Meta(OrderItemSerializer.Meta):
+        model = ArchivedOrderItem
+
+
+class ArchivedOrderSerializer(OrderSerializer):
+    """Renders an archived order exactly like a live one."""
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+
+    class Meta(OrderSerializer.Meta):
+        model = ArchivedOrder
@@ -1,3 +1,227 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import CustomUser
+from cart.models import Cart, CartItem
+from estore.query_budget import QueryBudgetMixin
+from products.models import Category, Product
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, ShippingAddress
+
+
+class OrderQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        cls.staff = CustomUser.objects.create_user(email='staff@example.com', username='staff', is_staff=True)
+        category = Category.objects.create(name='Audio')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Speaker {i}', description='', price=Decimal('10.00'), category=category, stock=10)
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def create_orders(self, count):
+        address = ShippingAddress.objects.create(
+            address_line1='1 Main St', city='Springfield', state='IL', postal_code='62701', country='US'
+        )
+        orders = [
+            Order.objects.create(user=self.user, total_price=Decimal('20.00'), shipping_address=address)
+            for _ in range(count)
+        ]
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for order in orders for product in self.products[:2]
+        ])
+
+    def test_order_list(self):
+        self.authenticate(self.user)
+        for size in (1, 100):
+            with self.subTest(orders=size):
+                Order.objects.all().delete()
+                self.create_orders(size)
+                with self.assertQueryBudget(7, max_time_ms=500):
+                    response = self.client.get('/api/orders/?limit=100')
+                self.assertEqual(response.json()['count'], size)
+                self.assertEqual(len(response.json()['results']), size)
+
+    def test_order_list_staff(self):
+        self.create_orders(100)
+        self.authenticate(self.staff)
+        with self.assertQueryBudget(7, max_time_ms=500):
+            response = self.client.get('/api/orders/')
+        self.assertEqual(response.json()['count'], 100)
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_order_detail(self):
+        self.create_orders(1)
+        self.authenticate(self.user)
+        order = Order.objects.get()
+        with self.assertQueryBudget(5):
+            response = self.client.get(f'/api/orders/{order.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_create_from_cart(self):
+        self.authenticate(self.user)
+        for size in (1, 5):
+            with self.subTest(cart_items=size):
+                cart, _ = Cart.objects.get_or_create(user=self.user)
+                CartItem.objects.bulk_create([
+                    CartItem(cart=cart, product=product, quantity=2) for product in self.products[:size]
+                ])
+                # Includes the savepoint pair around the atomic view and the queued task
+                with self.assertQueryBudget(12):
+                    response = self.client.post('/api/orders/create_from_cart/', {}, format='json')
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(len(response.json()['items']), size)
+
+
+class OrderArchiveTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        cls.other = CustomUser.objects.create_user(email='other@example.com', username='other')
+        category = Category.objects.create(name='Audio')
+        cls.product = Product.objects.create(
+            name='Speaker', description='', price=Decimal('10.00'), category=category, stock=10
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def create_order(self, status, days_ago=0, user=None):
+        order = Order.objects.create(user=user or self.user, total_price=Decimal('10.00'), status=status)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, price=Decimal('10.00'))
+        timestamp = timezone.now() - timedelta(days=days_ago)
+        Order.objects.filter(pk=order.pk).update(created_at=timestamp, updated_at=timestamp)
+        return order
+
+    def test_archive_moves_only_old_finished_orders(self):
+        delivered = self.create_order('DELIVERED', days_ago=400)
+        cancelled = self.create_order('CANCELLED', days_ago=400, user=self.other)
+        recent = self.create_order('DELIVERED', days_ago=10)
+        open_order = self.create_order('PENDING', days_ago=400)
+
+        call_command('archive_orders', older_than_days=365, batch_size=1, stdout=io.StringIO())
+
+        self.assertCountEqual(Order.objects.values_list('pk', flat=True), [recent.pk, open_order.pk])
+        archived = ArchivedOrder.objects.get(pk=delivered.pk)
+        self.assertEqual(archived.order_number, f'ORD-{delivered.pk}')
+        self.assertEqual(archived.status, 'DELIVERED')
+        self.assertTrue(ArchivedOrder.objects.filter(pk=cancelled.pk).exists())
+        self.assertEqual(ArchivedOrderItem.objects.filter(order__in=[delivered.pk, cancelled.pk]).count(), 2)
+        self.assertFalse(OrderItem.objects.filter(order__in=[delivered.pk, cancelled.pk]).exists())
+
+    def test_history_includes_archived_orders(self):
+        old = self.create_order('DELIVERED', days_ago=400)
+        self.create_order('CANCELLED', days_ago=400, user=self.other)
+        live = self.create_order('PROCESSING', days_ago=1)
+        call_command('archive_orders', stdout=io.StringIO())
+
+        response = self.client.get('/api/orders/')
+        self.assertEqual(response.json()['count'], 2)
+        results = response.json()['results']
+        self.assertEqual([order['id'] for order in results], [live.pk, old.pk])
+        self.assertEqual(results[1]['items'][0]['product']['id'], self.product.pk)
+
+        response = self.client.get(f'/api/orders/{old.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['order_number'], f'ORD-{old.pk}')
+
+    def test_paging_reaches_into_archive(self):
+        old = [self.create_order('DELIVERED', days_ago=400 + day) for day in range(3)]
+        live = [self.create_order('SHIPPED', days_ago=day) for day in range(3)]
+        call_command('archive_orders', stdout=io.StringIO())
+
+        pages = []
+        for page in (1, 2, 3):
+            # A page inside the live orders only probes the archive's sort keys
+            with self.assertQueryBudget({1: 7, 2: 9, 3: 5}[page]):
+                response = self.client.get(f'/api/orders/?page={page}&limit=2')
+            self.assertEqual(response.json()['count'], 6)
+            pages.append([order['id'] for order in response.json()['results']])
+        self.assertEqual(pages, [
+            [live[0].pk, live[1].pk], [live[2].pk, old[0].pk], [old[1].pk, old[2].pk]
+        ])
+
+        response = self.client.get('/api/orders/?page=1&limit=10&status=DELIVERED')
+        self.assertEqual([order['id'] for order in response.json()['results']], [o.pk for o in old])
+
+    def test_paging_merges_by_creation_date(self):
+        # An open order stays live however old it is, so archived orders can be newer
+        stale_open = self.create_order('PENDING', days_ago=500)
+        archived = self.create_order('DELIVERED', days_ago=400)
+        recent = self.create_order('SHIPPED', days_ago=1)
+        call_command('archive_orders', stdout=io.StringIO())
+
+        pages = []
+        for page in (1, 2, 3, 4):
+            response = self.client.get(f'/api/orders/?page={page}&limit=1')
+            self.assertEqual(response.json()['count'], 3)
+            pages.append([order['id'] for order in response.json()['results']])
+        self.assertEqual(pages, [[recent.pk], [archived.pk], [stale_open.pk], []])
+        self.assertEqual(
+            [order['id'] for order in self.client.get('/api/orders/?limit=5').json()['results']],
+            [recent.pk, archived.pk, stale_open.pk],
+        )
+
+
+class BulkTransitionTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        cls.staff = CustomUser.objects.create_user(email='staff@example.com', username='staff', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.staff)}')
+
+    def create_orders(self, *statuses):
+        return [
+            Order.objects.create(user=self.user, total_price=Decimal('10.00'), status=status)
+            for status in statuses
+        ]
+
+    def test_applies_allowed_transitions_only(self):
+        orders = self.create_orders('PENDING', 'PENDING', 'SHIPPED', 'CANCELLED')
+        before = Order.objects.get(pk=orders[0].pk).updated_at
+        with self.assertQueryBudget(3):
+            response = self.client.post('/api/orders/bulk_transition/', {
+                'ids': [order.pk for order in orders] + [999999], 'status': 'PROCESSING',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'updated': 2, 'skipped': {str(orders[2].pk): 'SHIPPED', str(orders[3].pk): 'CANCELLED'},
+        })
+        self.assertEqual(
+            list(Order.objects.order_by('pk').values_list('status', flat=True)),
+            ['PROCESSING', 'PROCESSING', 'SHIPPED', 'CANCELLED']
+        )
+        self.assertGreater(Order.objects.get(pk=orders[0].pk).updated_at, before)
+
+    def test_rejects_bad_requests(self):
+        order, = self.create_orders('PENDING')
+        for body in ({'ids': [order.pk], 'status': 'LOST'}, {'ids': [], 'status': 'SHIPPED'},
+                     {'ids': 'all', 'status': 'SHIPPED'}, {'ids': [True], 'status': 'CANCELLED'}):
+            with self.subTest(body=body):
+                response = self.client.post('/api/orders/bulk_transition/', body, format='json')
+                self.assertEqual(response.status_code, 400)
 
-# Create your tests here.
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        response = self.client.post(
+            '/api/orders/bulk_transition/', {'ids': [order.pk], 'status': 'CANCELLED'}, format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Order.objects.get().status, 'PENDING')
@@ -0,0 +1,35 @@
+"""
+Order status changes applied to many orders at once.
+
+``transition`` checks every order against ALLOWED_TRANSITIONS and moves the
+valid ones with a single UPDATE of ``status`` and ``updated_at``, instead of
+loading and saving each row. The UPDATE repeats the status check, so an
+order changed by someone else in the meantime is left alone.
+"""
+from django.utils import timezone
+
+ALLOWED_TRANSITIONS = {
+    'PENDING': {'PROCESSING', 'CANCELLED'},
+    'PROCESSING': {'SHIPPED', 'CANCELLED'},
+    'SHIPPED': {'DELIVERED'},
+    'DELIVERED': set(),
+    'CANCELLED': set(),
+}
+
+
+def sources(status):
+    """Statuses an order may move to ``status`` from."""
+    return {source for source, targets in ALLOWED_TRANSITIONS.items() if status in targets}
+
+
+def transition(queryset, status):
+    """
+    Move the orders in ``queryset`` to ``status`` where allowed. Return the
+    number updated and {pk: current status} for the orders that were skipped.
+    """
+    allowed = sources(status)
+    skipped = {
+        pk: current for pk, current in queryset.exclude(status__in=allowed).values_list('pk', 'status')
+    }
+    updated = queryset.filter(status__in=allowed).update(status=status, updated_at=timezone.now())
+    return updated, skipped
@@ -1,9 +1,19 @@
+import heapq
+import itertools
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Order, OrderItem, ShippingAddress
-from .serializers import OrderSerializer, ShippingAddressSerializer
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, ShippingAddress
+from .serializers import ArchivedOrderSerializer, OrderSerializer, ShippingAddressSerializer
+from .transitions import ALLOWED_TRANSITIONS, transition
 from cart.models import Cart, CartItem
+from idempotency.decorators import idempotent
+from products.tasks import record_order_recommendations
 from products.models import Product
 
 
@@ -11,15 +21,132 @@ class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
+    max_bulk = 500
 
     def get_queryset(self):
+        # Load everything OrderSerializer renders up front: one query for the
+        # orders (with user and address), one for all of their items.
+        queryset = Order.objects.select_related('user', 'shipping_address').prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product__category'))
+        )
+        if self.request.user.is_staff or self.request.user.is_superuser:
+            return queryset
+
+        return queryset.filter(user=self.request.user)
+
+    def get_archive_queryset(self):
+        queryset = ArchivedOrder.objects.select_related('user', 'shipping_address').prefetch_related(
+            Prefetch('items', queryset=ArchivedOrderItem.objects.select_related('product__category'))
+        )
         if self.request.user.is_staff or self.request.user.is_superuser:
-            return Order.objects.all()
+            return queryset
+
+        return queryset.filter(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Order history, one page at a time: ``{"count", "results"}`` for
+        ``?page=`` (default 1) and ``?limit=`` (default 20, at most 100).
+        Live and archived orders (see orders/archive.py) are merged newest
+        first by ``created_at``; ``?status=`` filters both.
+
+        An open order can be older than an archived one, so the tables do not
+        simply follow each other. A page is picked by merging the sort keys of
+        the first ``page * limit`` rows of each table. Once the live rows fill
+        that window, only archived keys at least as new as the last live key
+        can reach the page, and for most histories that range of the
+        (user, -created_at) index is empty. Only the rows on the page are
+        loaded in full.
+        """
+        orders = self.get_queryset().order_by('-created_at', '-pk')
+        archived = self.get_archive_queryset().order_by('-created_at', '-pk')
+        if request.query_params.get('status'):
+            orders = orders.filter(status=request.query_params['status'])
+            archived = archived.filter(status=request.query_params['status'])
+        context = self.get_serializer_context()
+
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            limit = max(1, min(int(request.query_params.get('limit', self.default_limit)), self.max_limit))
+        except ValueError:
+            return Response({'error': 'page and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        offset = (page - 1) * limit
+        end = offset + limit
 
-        return Order.objects.filter(user=self.request.user)
+        # Short reads double as counts
+        live_keys = list(orders.values_list('created_at', 'pk')[:end])
+        live_count = len(live_keys) if len(live_keys) < end else None
+        candidates = archived
+        if live_count is None:
+            # Archived orders older than the last live key cannot reach the page
+            candidates = archived.filter(created_at__gte=live_keys[-1][0])
+        archived_keys = list(candidates.values_list('created_at', 'pk')[:end])
+        archived_count = len(archived_keys) if live_count is not None and len(archived_keys) < end else None
+
+        merged = heapq.merge(
+            ((created_at, pk, True) for created_at, pk in live_keys),
+            ((created_at, pk, False) for created_at, pk in archived_keys),
+            reverse=True,
+        )
+        window = list(itertools.islice(merged, offset, end))
+        live_pks = [pk for _, pk, is_live in window if is_live]
+        archived_pks = [pk for _, pk, is_live in window if not is_live]
+        rows = {}
+        if live_pks:
+            for row in OrderSerializer(orders.filter(pk__in=live_pks), many=True, context=context).data:
+                rows[row['id']] = row
+        if archived_pks:
+            for row in ArchivedOrderSerializer(archived.filter(pk__in=archived_pks), many=True, context=context).data:
+                rows[row['id']] = row
+
+        if live_count is None:
+            live_count = orders.count()
+        if archived_count is None:
+            archived_count = archived.count()
+        return Response({
+            'count': live_count + archived_count,
+            'results': [rows[pk] for _, pk, _ in window],
+        })
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            order = get_object_or_404(self.get_archive_queryset(), pk=kwargs['pk'])
+            return Response(ArchivedOrderSerializer(order, context=self.get_serializer_context()).data)
+
+    @action(detail=False, methods=['POST'], permission_classes=[permissions.IsAdminUser])
+    def bulk_transition(self, request):
+        """
+        Staff only: move the orders in ``ids`` to ``status`` with one UPDATE.
+        Orders whose current status does not allow the move are left as they
+        are and listed in ``skipped``; unknown ids are ignored.
+        """
+        ids = request.data.get('ids')
+        new_status = request.data.get('status')
+        if new_status not in ALLOWED_TRANSITIONS:
+            return Response(
+                {'error': f"status must be one of {', '.join(ALLOWED_TRANSITIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (not isinstance(ids, list) or not 0 < len(ids) <= self.max_bulk
+                or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids)):
+            return Response(
+                {'error': f'ids must be a list of 1 to {self.max_bulk} order ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        updated, skipped = transition(Order.objects.filter(pk__in=ids), new_status)
+        return Response({'updated': updated, 'skipped': skipped})
 
     @action(detail=False, methods=['POST'])
+    @idempotent
+    @transaction.atomic
     def create_from_cart(self, request):
+        # The order, its items, the emptied cart and the queued follow-up
+        # tasks commit together; the tasks run after the response is sent.
         # Get user's cart
         try:
             cart = Cart.objects.get(user=request.user)
@@ -27,8 +154,8 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Check if cart has items
-        cart_items = CartItem.objects.filter(cart=cart)
-        if not cart_items.exists():
+        cart_items = list(CartItem.objects.filter(cart=cart).select_related('product'))
+        if not cart_items:
             return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Get or create shipping address (if provided in request)
@@ -56,16 +183,25 @@ class OrderViewSet(viewsets.ModelViewSet):
         )
 
         # Create order items
-        for cart_item in cart_items:
-            OrderItem.objects.create(
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
                 product=cart_item.product,
                 quantity=cart_item.quantity,
                 price=cart_item.product.price
             )
+            for cart_item in cart_items
+        ])
 
         # Clear the cart
-        cart_items.delete()
+        CartItem.objects.filter(cart=cart).delete()
+
+        record_order_recommendations.delay(
+            [item.product_id for item in cart_items],
+            idempotency_key=f'order:{order.pk}:recommendations',
+        )
 
+        # Re-read through get_queryset so the response is rendered without N+1s
+        order = self.get_queryset().get(pk=order.pk)
         serializer = self.get_serializer(order)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,89 @@
+from functools import wraps
+
+from django.db.models import Q
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from estore.throttling import throttled
+from .models import Product, Category
+from .serializers import ProductSerializer, CategorySerializer
+
+# Read-only catalog endpoints served natively on the ASGI stack. They return the
+# same payloads as ProductViewSet / CategoryViewSet but never block a worker
+# thread while waiting on the database. THROTTLE_RATES applies to them under
+# their own route names (async-product-list, ...).
+
+SEARCH_FIELDS = ['name', 'description', 'category__name']
+ORDERING_FIELDS = ['price', 'name']
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def _read_only(view):
+    # require_GET only supports async views from Django 5.0 onwards
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _product_queryset(request):
+    queryset = Product.objects.select_related('category')
+
+    # Same semantics as SearchFilter: every term must match one of the fields
+    search = request.GET.get('search', '')
+    for term in search.replace(',', ' ').split():
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(condition)
+
+    ordering = [
+        field for field in request.GET.get('ordering', '').split(',')
+        if field.lstrip('-') in ORDERING_FIELDS
+    ]
+    if ordering:
+        queryset = queryset.order_by(*ordering)
+    return queryset
+
+
+@_read_only
+@throttled
+async def product_list(request):
+    products = [product async for product in _product_queryset(request).aiterator()]
+    serializer = ProductSerializer(products, many=True, context={'request': request})
+    return _json(serializer.data)
+
+
+@_read_only
+@throttled
+async def product_detail(request, pk):
+    try:
+        product = await Product.objects.select_related('category').aget(pk=pk)
+    except Product.DoesNotExist:
+        return _json({'detail': 'No Product matches the given query.'}, status=404)
+
+    serializer = ProductSerializer(product, context={'request': request})
+    return _json(serializer.data)
+
+
+@_read_only
+@throttled
+async def category_list(request):
+    categories = [category async for category in Category.objects.all().aiterator()]
+    return _json(CategorySerializer(categories, many=True).data)
+
+
+@_read_only
+@throttled
+async def category_detail(request, pk):
+    try:
+        category = await Category.objects.aget(pk=pk)
+    except Category.DoesNotExist:
+        return _json({'detail': 'No Category matches the given query.'}, status=404)
+
+    return _json(CategorySerializer(category).data)
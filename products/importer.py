@@ -0,0 +1,194 @@
+import codecs
+import csv
+import itertools
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .models import CatalogChange, Category, Product
+
+# Columns a feed may set. Rows are matched on ``sku`` (upsert), else on ``id``
+# (update only); rows with neither are created.
+IMPORT_FIELDS = ['name', 'description', 'price', 'stock', 'condition']
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_rows(lines, fmt):
+    """Yield (line number, row dict) from an iterable of text lines."""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'ndjson':
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else {'__invalid__': line}
+    else:
+        raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def decode_lines(binary_lines, encoding='utf-8'):
+    return codecs.iterdecode(binary_lines, encoding)
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def error(self, line, sku, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'sku': sku, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows / self.elapsed, 1) if self.elapsed else 0.0,
+        }
+
+
+class ProductImporter:
+    """
+    Validate and upsert product rows in batches.
+
+    Categories are resolved from an in-memory map (by id or case-insensitive
+    name) loaded once per import, so rows never trigger their own lookup.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.categories_by_id = {}
+        self.categories_by_name = {}
+        for pk, name in Category.objects.values_list('pk', 'name'):
+            self.categories_by_id[pk] = pk
+            self.categories_by_name.setdefault(name.strip().lower(), pk)
+        self.fields = {name: Product._meta.get_field(name) for name in IMPORT_FIELDS}
+
+    def run(self, rows):
+        result = ImportResult()
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch, result)
+        result.elapsed = time.perf_counter() - result.started
+        return result
+
+    def clean(self, row):
+        """Return (product, errors) for one raw row."""
+        if '__invalid__' in row:
+            return None, {'row': ['Not a JSON object.']}
+
+        errors = {}
+        values = {}
+        for name, field in self.fields.items():
+            raw = row.get(name)
+            if raw in (None, '') and field.has_default():
+                raw = field.get_default()
+            try:
+                values[name] = field.clean(raw, None)
+            except ValidationError as exc:
+                errors[name] = exc.messages
+
+        category_id = self.resolve_category(row)
+        if category_id is None:
+            errors['category'] = ['Unknown or missing category.']
+
+        pk = row.get('id') or None
+        if pk is not None:
+            try:
+                pk = int(pk)
+            except (TypeError, ValueError):
+                errors['id'] = ['A valid integer is required.']
+
+        sku = str(row.get('sku') or '').strip() or None
+        if sku and len(sku) > 64:
+            errors['sku'] = ['Ensure this field has no more than 64 characters.']
+
+        if errors:
+            return None, errors
+        return Product(pk=pk, sku=sku, category_id=category_id, **values), None
+
+    def resolve_category(self, row):
+        category_id = row.get('category_id')
+        if category_id not in (None, ''):
+            try:
+                return self.categories_by_id.get(int(category_id))
+            except (TypeError, ValueError):
+                return None
+        name = row.get('category')
+        if name:
+            return self.categories_by_name.get(str(name).strip().lower())
+        return None
+
+    def import_batch(self, batch, result):
+        by_sku = {}
+        by_pk = {}
+        new = []
+        for line, row in batch:
+            result.rows += 1
+            product, errors = self.clean(row)
+            if errors:
+                result.error(line, row.get('sku') if isinstance(row, dict) else None, errors)
+            elif product.sku:
+                product.pk = None  # The SKU is the key; never overwrite ids from a feed
+                by_sku[product.sku] = product  # Later rows for the same SKU win
+            elif product.pk:
+                by_pk[product.pk] = (line, product)
+            else:
+                new.append(product)
+
+        # Bulk writes skip model signals, so feed the change log directly
+        changed = []
+        with transaction.atomic():
+            if by_sku:
+                existing = set(
+                    Product.objects.filter(sku__in=list(by_sku)).values_list('sku', flat=True)
+                )
+                Product.objects.bulk_create(
+                    list(by_sku.values()),
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=[*IMPORT_FIELDS, 'category'],
+                )
+                result.updated += len(existing)
+                result.created += len(by_sku) - len(existing)
+                changed = list(Product.objects.filter(sku__in=list(by_sku)).values_list('pk', flat=True))
+
+            if by_pk:
+                existing = set(Product.objects.filter(pk__in=list(by_pk)).values_list('pk', flat=True))
+                for pk, (line, _) in by_pk.items():
+                    if pk not in existing:
+                        result.error(line, None, {'id': [f'Product {pk} does not exist.']})
+                Product.objects.bulk_update(
+                    [product for pk, (_, product) in by_pk.items() if pk in existing],
+                    fields=[*IMPORT_FIELDS, 'category'],
+                )
+                result.updated += len(existing)
+                changed.extend(existing)
+
+            if new:
+                Product.objects.bulk_create(new)
+                result.created += len(new)
+                changed.extend(product.pk for product in new)
+
+            CatalogChange.record(CatalogChange.PRODUCT, changed)
@@ -0,0 +1,87 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from estore import images
+from products.models import Product
+
+TARGETS = {
+    'product': (Product, 'image', 'image_variants'),
+    'user': (get_user_model(), 'profile_picture', 'profile_picture_variants'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate responsive image variants for existing product images and '
+        'profile pictures, resizing in parallel worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=[*TARGETS, 'all'], default='all')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes; 0 resizes in this process')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild variants that already look up to date')
+
+    def handle(self, *args, **options):
+        names = TARGETS if options['model'] == 'all' else [options['model']]
+        if options['workers'] == 0:
+            for name in names:
+                self.backfill(None, name, *TARGETS[name], force=options['force'])
+            return
+
+        # Worker processes only touch storage; close connections before forking
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for name in names:
+                self.backfill(pool, name, *TARGETS[name], force=options['force'])
+
+    def backfill(self, pool, name, model, field_name, variants_field, force):
+        rows = (
+            model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            .values_list('pk', field_name, variants_field)
+        )
+        pending = {}
+        for pk, source, variants in rows.iterator():
+            if force or (variants or {}).get('source') != source:
+                pending.setdefault(source, []).append(pk)
+
+        self.stdout.write(f'{name}: {len(pending)} image(s) to process')
+        start = time.perf_counter()
+        done = failed = 0
+        for source, variants, error in self.build(pool, pending):
+            if error is not None:
+                failed += 1
+                self.stderr.write(f'  {source}: {error}')
+                continue
+            model.objects.filter(pk__in=pending[source], **{field_name: source}).update(
+                **{variants_field: variants}
+            )
+            done += 1
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: {done} processed, {failed} failed in {elapsed:.1f}s'
+        ))
+
+    def build(self, pool, sources):
+        """Yield (source, variants, error) as each image is finished."""
+        if pool is None:
+            for source in sources:
+                try:
+                    yield source, images.build_variants(source), None
+                except Exception as exc:  # Corrupt or missing files should not stop the run
+                    yield source, None, exc
+            return
+
+        futures = {pool.submit(images.build_variants, source): source for source in sources}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as exc:
+                yield futures[future], None, exc
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild "frequently bought together" recommendations from order '
+        'history: count product co-purchases and store each product\'s top K.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=recommendations.TOP_K)
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Order lines fetched per round trip')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows written per INSERT')
+        parser.add_argument('--products-per-pass', type=int, default=recommendations.PRODUCTS_PER_PASS,
+                            help='Product ids whose rows are built per pass over the order lines')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = recommendations.rebuild(
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            products_per_pass=options['products_per_pass'],
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {result['pairs']} co-purchase pair(s) for {result['products']} product(s) in {elapsed:.1f}s"
+        ))
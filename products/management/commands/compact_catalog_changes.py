@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from products.models import CatalogChange
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete change-log entries superseded by a later entry for the same '
+        'object. Every sync cursor still sees the latest state of each object.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        # Ignore entries written while compacting; they may supersede nothing yet
+        ceiling = CatalogChange.objects.aggregate(Max('pk'))['pk__max'] or 0
+        changes = CatalogChange.objects.filter(pk__lte=ceiling)
+        latest = (
+            changes.values('entity', 'object_id')
+            .annotate(latest=Max('pk')).values_list('latest', flat=True)
+        )
+        keep = set(latest)
+        stale = []
+        deleted = 0
+        for pk in changes.values_list('pk', flat=True).iterator():
+            if pk not in keep:
+                stale.append(pk)
+            if len(stale) >= options['batch_size']:
+                deleted += CatalogChange.objects.filter(pk__in=stale).delete()[0]
+                stale.clear()
+        if stale:
+            deleted += CatalogChange.objects.filter(pk__in=stale).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} superseded change(s).'))
@@ -0,0 +1,37 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import ProductImporter, read_rows
+
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+class Command(BaseCommand):
+    help = 'Upsert products from a CSV or NDJSON feed, matching existing rows on sku (or id).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed file to import')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='Feed format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or FORMATS.get(os.path.splitext(path)[1].lower())
+        if fmt is None:
+            raise CommandError('Cannot tell the feed format from the file name; pass --format.')
+
+        importer = ProductImporter(batch_size=options['batch_size'])
+        with open(path, newline='', encoding='utf-8') as fh:
+            result = importer.run(read_rows(fh, fmt)).as_dict()
+
+        for error in result['errors']:
+            self.stderr.write(f"row {error['row']} ({error['sku'] or '-'}): {error['errors']}")
+        if result['errors_truncated']:
+            self.stderr.write(f"... {result['failed'] - len(result['errors'])} more errors not shown")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['rows']} rows: {result['created']} created, {result['updated']} updated, "
+            f"{result['failed']} failed in {result['elapsed_seconds']}s "
+            f"({result['rows_per_second']} rows/s)"
+        ))
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    # Seed the log with the existing catalog so a sync from cursor 0 is complete
+    CatalogChange = apps.get_model('products', 'CatalogChange')
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+    for entity, model in (('category', Category), ('product', Product)):
+        ids = model.objects.order_by('pk').values_list('pk', flat=True)
+        CatalogChange.objects.bulk_create(
+            [CatalogChange(entity=entity, object_id=pk, action='upsert') for pk in ids.iterator()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_catalogchange'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -14,6 +14,7 @@ class Product(models.Model):
         ('REFURBISHED', 'Refurbished')
     ]
 
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)  # Natural key for bulk imports
     name = models.CharField(max_length=255)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -21,6 +22,63 @@ class Product(models.Model):
     stock = models.PositiveIntegerField()
     condition = models.CharField(max_length=20, choices=CONDITION_CHOICES, default='NEW')
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # See estore/images.py
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class CatalogChange(models.Model):
+    """
+    Append-only log of catalog writes, read by the ``changes/`` delta feed.
+    The auto-increment id doubles as the client's sync cursor.
+    """
+    PRODUCT = 'product'
+    CATEGORY = 'category'
+    ENTITY_CHOICES = [
+        (PRODUCT, 'Product'),
+        (CATEGORY, 'Category')
+    ]
+
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, 'Created or updated'),
+        (DELETE, 'Deleted')
+    ]
+
+    entity = models.CharField(max_length=10, choices=ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['entity', 'object_id'])]
+
+    @classmethod
+    def record(cls, entity, object_ids, action=UPSERT):
+        cls.objects.bulk_create([cls(entity=entity, object_id=pk, action=action) for pk in object_ids])
+
+    def __str__(self):
+        return f"{self.action} {self.entity} {self.object_id}"
+
+class ProductCooccurrence(models.Model):
+    """
+    One non-zero cell of the product x product co-purchase matrix: how many
+    orders contain both products. Stored in both directions so a product's
+    row is a single index range scan.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_product_cooccurrence')
+        ]
+        indexes = [models.Index(fields=['product', '-count'])]
+
+class ProductRecommendation(models.Model):
+    """Top-K co-purchased products, keyed by product id for a single-row lookup."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    neighbors = models.JSONField(default=list)  # [[product_id, count], ...] best first
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,158 @@
+"""
+"Frequently bought together" recommendations.
+
+The product x product co-purchase matrix is sparse: most pairs of products
+never share an order. ``rebuild`` streams order lines and accumulates the
+non-zero cells row by row (a dict-of-counters, the CSR layout without the
+NumPy dependency), then stores the cells in ProductCooccurrence and each
+row's top K in ProductRecommendation, so serving is one primary-key lookup.
+To bound memory it builds the rows of one range of product ids per pass over
+the order lines, and it replaces the stored rows a small range at a time,
+each in its own short transaction, so ``record_order`` tasks are never held
+up for long.
+
+New orders are folded in incrementally by ``record_order``, queued as a
+background task when the order is placed: the cells for its basket are
+bumped in place and only the rows of the products in that basket are
+re-ranked. Run ``build_recommendations`` periodically to drop cancelled
+orders and correct any drift.
+"""
+import heapq
+import itertools
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F, Max
+
+from orders.models import ArchivedOrderItem, OrderItem
+from .models import Product, ProductCooccurrence, ProductRecommendation
+
+TOP_K = 20
+
+# Product ids whose rows are built per pass over the order lines, and
+# replaced per write transaction
+PRODUCTS_PER_PASS = 50000
+PRODUCTS_PER_TRANSACTION = 500
+
+# Very large (wholesale) orders add a quadratic number of weak pairs
+MAX_BASKET_SIZE = 100
+
+
+def iter_baskets(chunk_size=5000):
+    """Yield the set of product ids in each non-cancelled order, archived ones included."""
+    # Live and archived orders never share an id, so the groups stay apart
+    lines = itertools.chain.from_iterable(
+        model.objects.exclude(order__status='CANCELLED')
+        .order_by('order_id').values_list('order_id', 'product_id')
+        .iterator(chunk_size=chunk_size)
+        for model in (OrderItem, ArchivedOrderItem)
+    )
+    for _, group in itertools.groupby(lines, key=lambda line: line[0]):
+        yield {product_id for _, product_id in group}
+
+
+def count_pairs(baskets, products=None):
+    """
+    Return the sparse co-occurrence matrix as {product_id: Counter(other_id: count)},
+    limited to the rows of ``products`` if given.
+    """
+    rows = defaultdict(Counter)
+    for basket in baskets:
+        if len(basket) > MAX_BASKET_SIZE:
+            continue
+        for product_id in basket:
+            if products is not None and product_id not in products:
+                continue
+            row = rows[product_id]
+            for other_id in basket:
+                if other_id != product_id:
+                    row[other_id] += 1
+    return rows
+
+
+def top_neighbors(row, k=TOP_K):
+    # Highest count first; ties go to the lower product id so results are stable
+    best = heapq.nsmallest(k, row.items(), key=lambda cell: (-cell[1], cell[0]))
+    return [[other_id, count] for other_id, count in best]
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _replace_rows(products, rows, top_k, batch_size):
+    """Swap the stored rows of the ids in ``products`` (a range) for ``rows``."""
+    cells = [
+        ProductCooccurrence(product_id=product_id, other_id=other_id, count=count)
+        for product_id in products if product_id in rows
+        for other_id, count in rows[product_id].items()
+    ]
+    recommendations = [
+        ProductRecommendation(product_id=product_id, neighbors=top_neighbors(rows[product_id], top_k))
+        for product_id in products if product_id in rows
+    ]
+    with transaction.atomic():
+        ProductCooccurrence.objects.filter(product_id__gte=products.start, product_id__lt=products.stop).delete()
+        ProductRecommendation.objects.filter(product_id__gte=products.start, product_id__lt=products.stop).delete()
+        for chunk in _chunks(cells, batch_size):
+            ProductCooccurrence.objects.bulk_create(chunk)
+        for chunk in _chunks(recommendations, batch_size):
+            ProductRecommendation.objects.bulk_create(chunk)
+    return len(recommendations), len(cells)
+
+
+def rebuild(top_k=TOP_K, chunk_size=5000, batch_size=5000, products_per_pass=PRODUCTS_PER_PASS):
+    """Recompute the whole matrix and every product's top K from order history."""
+    last_id = Product.objects.aggregate(Max('pk'))['pk__max'] or 0
+    products = stored = 0
+    for start in range(1, last_id + 1, products_per_pass):
+        passed = range(start, min(start + products_per_pass, last_id + 1))
+        rows = count_pairs(iter_baskets(chunk_size), passed)
+        for low in range(passed.start, passed.stop, PRODUCTS_PER_TRANSACTION):
+            written = _replace_rows(
+                range(low, min(low + PRODUCTS_PER_TRANSACTION, passed.stop)), rows, top_k, batch_size
+            )
+            products += written[0]
+            stored += written[1]
+    return {'products': products, 'pairs': stored}
+
+
+def refresh(product_ids, top_k=TOP_K):
+    """Re-rank the stored rows of ``product_ids``."""
+    rows = {product_id: {} for product_id in product_ids}
+    cells = ProductCooccurrence.objects.filter(product_id__in=rows).values_list('product_id', 'other_id', 'count')
+    for product_id, other_id, count in cells:
+        rows[product_id][other_id] = count
+    ProductRecommendation.objects.bulk_create(
+        [
+            ProductRecommendation(product_id=product_id, neighbors=top_neighbors(row, top_k))
+            for product_id, row in rows.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['neighbors', 'updated_at'],
+    )
+
+
+def record_order(product_ids, top_k=TOP_K):
+    """Add one order's basket to the matrix and re-rank the affected rows."""
+    basket = sorted(set(product_ids))
+    if not 1 < len(basket) <= MAX_BASKET_SIZE:
+        return
+
+    with transaction.atomic():
+        # Make sure every cell exists, then bump them all in one statement
+        ProductCooccurrence.objects.bulk_create(
+            [
+                ProductCooccurrence(product_id=product_id, other_id=other_id)
+                for product_id, other_id in itertools.permutations(basket, 2)
+            ],
+            ignore_conflicts=True,
+        )
+        ProductCooccurrence.objects.filter(product_id__in=basket, other_id__in=basket).update(
+            count=F('count') + 1
+        )
+        refresh(basket, top_k)
+
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from estore.images import variant_urls
 from .models import Product, Category
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -13,8 +14,16 @@ class ProductSerializer(serializers.ModelSerializer):
         source='category', 
         write_only=True
     )
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'category', 'category_id', 
-                  'stock', 'condition', 'image']
\ No newline at end of file
+        fields = ['id', 'sku', 'name', 'description', 'price', 'category', 'category_id', 
+                  'stock', 'condition', 'image', 'image_variants']
+
+    def validate_sku(self, value):
+        # Store missing SKUs as NULL so they don't collide on the unique index
+        return value or None
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image_variants, self.context.get('request'))
\ No newline at end of file
@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from estore import images
+from . import typeahead
+from .models import CatalogChange, Category, Product
+
+
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, **kwargs):
+    # Resize new uploads in the background once the row is committed
+    images.schedule(instance, 'image', 'image_variants')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def record_catalog_upsert(sender, instance, **kwargs):
+    entity = CatalogChange.PRODUCT if sender is Product else CatalogChange.CATEGORY
+    CatalogChange.record(entity, [instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def record_catalog_delete(sender, instance, **kwargs):
+    entity = CatalogChange.PRODUCT if sender is Product else CatalogChange.CATEGORY
+    CatalogChange.record(entity, [instance.pk], CatalogChange.DELETE)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def update_typeahead(sender, instance, **kwargs):
+    entity = CatalogChange.PRODUCT if sender is Product else CatalogChange.CATEGORY
+    pk, name = instance.pk, instance.name
+    transaction.on_commit(lambda: typeahead.upsert(entity, pk, name))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def remove_from_typeahead(sender, instance, **kwargs):
+    entity = CatalogChange.PRODUCT if sender is Product else CatalogChange.CATEGORY
+    pk = instance.pk
+    transaction.on_commit(lambda: typeahead.remove(entity, pk))
@@ -0,0 +1,8 @@
+from tasks.queue import task
+from . import recommendations
+
+
+@task(max_attempts=3)
+def record_order_recommendations(product_ids):
+    """Fold a new order's basket into the co-purchase recommendations."""
+    recommendations.record_order(product_ids)
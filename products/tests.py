@@ -1,3 +1,397 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from estore.query_budget import QueryBudgetMixin
+from orders.models import Order, OrderItem
+from . import recommendations, typeahead
+from .models import CatalogChange, Category, Product, ProductCooccurrence
+
+
+class ProductQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_products(self, count):
+        categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(5)])
+        return Product.objects.bulk_create([
+            Product(name=f'Product {i}', description='A product', price=Decimal('9.99'),
+                    category=categories[i % 5], stock=5)
+            for i in range(count)
+        ])
+
+    def test_product_list(self):
+        for size in (1, 100):
+            with self.subTest(products=size):
+                Category.objects.all().delete()
+                self.create_products(size)
+                with self.assertQueryBudget(1, max_time_ms=500):
+                    response = self.client.get('/api/products/products/')
+                self.assertEqual(len(response.json()), size)
+
+    def test_product_search(self):
+        self.create_products(100)
+        with self.assertQueryBudget(1, max_time_ms=500):
+            response = self.client.get('/api/products/products/', {'search': 'category', 'ordering': '-price'})
+        self.assertEqual(len(response.json()), 100)
+
+    def test_product_detail(self):
+        product = self.create_products(1)[0]
+        with self.assertQueryBudget(1):
+            response = self.client.get(f'/api/products/products/{product.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_category_list(self):
+        self.create_products(1)
+        with self.assertQueryBudget(1):
+            response = self.client.get('/api/products/categories/')
+        self.assertEqual(len(response.json()), 5)
+
+    def test_async_product_list(self):
+        self.create_products(100)
+        with self.assertQueryBudget(1, max_time_ms=500):
+            response = self.client.get('/api/products/async/products/')
+        self.assertEqual(len(response.json()), 100)
+
+
+class ProductBulkImportTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = CustomUser.objects.create_user(email='staff@example.com', username='staff', is_staff=True)
+        self.client.force_authenticate(self.staff)
+        self.category = Category.objects.create(name='Garden')
+
+    def post(self, body, content_type='text/csv'):
+        return self.client.generic('POST', '/api/products/products/bulk_import/', body, content_type)
+
+    def test_csv_upsert(self):
+        Product.objects.create(sku='A-1', name='Old', description='Old', price='1.00', category=self.category, stock=1)
+        rows = ['sku,name,description,price,stock,category'] + [
+            f'A-{i},Hose {i},Green hose,{i}.50,{i},garden' for i in range(1, 301)
+        ]
+        with self.assertQueryBudget(10):
+            response = self.post('\n'.join(rows))
+
+        result = response.json()
+        self.assertEqual((result['created'], result['updated'], result['failed']), (299, 1, 0))
+        self.assertEqual(Product.objects.get(sku='A-1').name, 'Hose 1')
+
+    def test_ndjson_row_errors(self):
+        rows = [
+            '{"sku": "B-1", "name": "Rake", "description": "Metal", "price": "12.00", "stock": 3, "category_id": %d}'
+            % self.category.pk,
+            '{"sku": "B-2", "name": "", "description": "x", "price": "abc", "stock": 1, "category": "Nope"}',
+            'not json',
+        ]
+        response = self.post('\n'.join(rows), 'application/x-ndjson')
+
+        result = response.json()
+        self.assertEqual((result['created'], result['failed']), (1, 2))
+        self.assertEqual(set(result['errors'][0]['errors']), {'name', 'price', 'category'})
+        self.assertEqual(result['errors'][1]['row'], 3)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(CustomUser.objects.create_user(email='u@example.com', username='u'))
+        self.assertEqual(self.post('sku,name\n').status_code, 403)
+
+
+@override_settings(CATALOG_CHANGES_VISIBILITY_DELAY=0)
+class CatalogChangesTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Kitchen')
+
+    def sync(self, since):
+        return self.client.get('/api/products/changes/', {'since': since}).json()
+
+    def test_delta_since_cursor(self):
+        kettle = Product.objects.create(name='Kettle', description='', price='20.00', category=self.category, stock=1)
+        cursor = self.sync(0)['cursor']
+
+        kettle.stock = 5
+        kettle.save()
+        toaster = Product.objects.create(name='Toaster', description='', price='30.00', category=self.category, stock=1)
+        toaster_id = toaster.pk
+        toaster.delete()
+
+        with self.assertQueryBudget(3):
+            feed = self.sync(cursor)
+        self.assertEqual([p['stock'] for p in feed['products']], [5])
+        self.assertEqual(feed['deleted'], {'products': [toaster_id], 'categories': []})
+        self.assertEqual(self.sync(feed['cursor'])['products'], [])
+
+    def test_paging(self):
+        for i in range(4):
+            Product.objects.create(name=f'Cup {i}', description='', price='2.00', category=self.category, stock=1)
+
+        seen, cursor, has_more = [], 0, True
+        while has_more:
+            feed = self.client.get('/api/products/changes/', {'since': cursor, 'limit': 2}).json()
+            seen += [p['name'] for p in feed['products']] + [c['name'] for c in feed['categories']]
+            cursor, has_more = feed['cursor'], feed['has_more']
+        self.assertCountEqual(seen, ['Kitchen', 'Cup 0', 'Cup 1', 'Cup 2', 'Cup 3'])
+
+    @override_settings(CATALOG_CHANGES_VISIBILITY_DELAY=60)
+    def test_recent_changes_are_held_back(self):
+        CatalogChange.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        kettle = Product.objects.create(name='Kettle', description='', price='20.00', category=self.category, stock=1)
+
+        feed = self.sync(0)
+        self.assertEqual([c['name'] for c in feed['categories']], ['Kitchen'])
+        self.assertEqual(feed['products'], [])
+        self.assertFalse(feed['has_more'])
+        cursor = feed['cursor']
+        self.assertLess(cursor, CatalogChange.objects.get(object_id=kettle.pk, entity=CatalogChange.PRODUCT).pk)
+
+        CatalogChange.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual([p['name'] for p in self.sync(cursor)['products']], ['Kettle'])
+
+
+class RecommendationTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        category = Category.objects.create(name='Kitchen')
+        cls.kettle, cls.mug, cls.tea, cls.toaster = Product.objects.bulk_create([
+            Product(name=name, description='', price=Decimal('5.00'), category=category, stock=10)
+            for name in ('Kettle', 'Mug', 'Tea', 'Toaster')
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def order(self, *products, status='PENDING'):
+        order = Order.objects.create(user=self.user, total_price=Decimal('10.00'), status=status)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price) for product in products
+        ])
+
+    def related(self, product):
+        return [p['name'] for p in self.client.get(f'/api/products/products/{product.pk}/related/').json()]
+
+    def test_rebuild(self):
+        self.order(self.kettle, self.mug, self.tea)
+        self.order(self.kettle, self.tea)
+        self.order(self.kettle, self.toaster, status='CANCELLED')
+        self.assertEqual(recommendations.rebuild(), {'products': 3, 'pairs': 6})
+
+        with self.assertQueryBudget(2):
+            self.assertEqual(self.related(self.kettle), ['Tea', 'Mug'])
+        self.assertEqual(self.related(self.toaster), [])
+        self.assertEqual(self.client.get('/api/products/products/999/related/').status_code, 404)
+
+    def test_record_order(self):
+        self.order(self.kettle, self.mug)
+        recommendations.rebuild()
+        recommendations.record_order([self.kettle.pk, self.tea.pk])
+        recommendations.record_order([self.kettle.pk, self.tea.pk])
+
+        with self.assertQueryBudget(8):
+            recommendations.record_order([self.kettle.pk, self.tea.pk, self.mug.pk])
+
+        self.assertEqual(self.related(self.kettle), ['Tea', 'Mug'])
+        self.assertEqual(self.related(self.tea), ['Kettle', 'Mug'])
+        self.assertEqual(ProductCooccurrence.objects.get(product=self.tea, other=self.kettle).count, 3)
+
+    def test_rebuild_in_passes_replaces_stale_rows(self):
+        self.order(self.kettle, self.mug, self.tea)
+        self.order(self.kettle, self.tea)
+        ProductCooccurrence.objects.create(product=self.toaster, other=self.kettle, count=9)
+        recommendations.refresh([self.toaster.pk])
+
+        self.assertEqual(recommendations.rebuild(products_per_pass=1), {'products': 3, 'pairs': 6})
+        self.assertEqual(self.related(self.kettle), ['Tea', 'Mug'])
+        self.assertEqual(self.related(self.toaster), [])
+        self.assertFalse(ProductCooccurrence.objects.filter(product=self.toaster).exists())
+
+
+class TypeaheadTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create_user(email='shopper@example.com', username='shopper')
+        cls.kitchen = Category.objects.create(name='Kitchen')
+        cls.kettle, cls.kebab, cls.toaster = Product.objects.bulk_create([
+            Product(name=name, description='', price=Decimal('5.00'), category=cls.kitchen, stock=10)
+            for name in ('Electric Kettle', 'Kebab Skewers', 'Toaster')
+        ])
+        order = Order.objects.create(user=user, total_price=Decimal('5.00'))
+        OrderItem.objects.create(order=order, product=cls.kebab, quantity=3, price=Decimal('5.00'))
+
+    def setUp(self):
+        self.client = APIClient()
+        typeahead.reset()
+        self.addCleanup(typeahead.reset)
+
+    def complete(self, q, **params):
+        response = self.client.get('/api/products/products/autocomplete/', {'q': q, **params})
+        return [item['name'] for item in response.json()]
+
+    def test_prefix_ranked_by_popularity(self):
+        typeahead.build()
+        with self.assertQueryBudget(0):
+            self.assertEqual(self.complete('ke'), ['Kebab Skewers', 'Electric Kettle'])
+        self.assertEqual(self.complete('KIT'), ['Kitchen'])
+        self.assertEqual(self.complete('elec ket', type='products'), ['Electric Kettle'])
+        self.assertEqual(self.complete('k'), [])
+
+    def test_signals_update_index(self):
+        typeahead.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.toaster.name = 'Kettle Toaster'
+            self.toaster.save()
+            self.kebab.delete()
+        self.assertEqual(self.complete('ke'), ['Electric Kettle', 'Kettle Toaster'])
+
+    def test_sync_from_change_log(self):
+        index = typeahead.build()
+        # A bulk write elsewhere: no signals, only the change log
+        Product.objects.filter(pk=self.toaster.pk).update(name='Kettle Toaster')
+        CatalogChange.record(CatalogChange.PRODUCT, [self.toaster.pk])
+        index.sync()
+        self.assertEqual(index.search('kettle toa'), [
+            {'type': 'product', 'id': self.toaster.pk, 'name': 'Kettle Toaster'}
+        ])
+
+
+class ColdTypeaheadTests(TransactionTestCase):
+    def setUp(self):
+        typeahead.reset()
+        self.addCleanup(typeahead.reset)
+        category = Category.objects.create(name='Kitchen')
+        self.kettle = Product.objects.create(
+            name='Electric Kettle', description='', price=Decimal('5.00'), category=category, stock=1
+        )
+
+    def complete(self, q):
+        return [item['name'] for item in self.client.get('/api/products/products/autocomplete/', {'q': q}).json()]
+
+    def test_cold_request_does_not_wait_for_the_build(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.complete('ket'), [])
+        typeahead._worker.join()
+        self.assertEqual(self.complete('ket'), ['Electric Kettle'])
+
+    def test_warm(self):
+        typeahead.warm().join()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.complete('kit'), ['Kitchen'])
+
+    def test_stale_index_syncs_in_background(self):
+        index = typeahead.build()
+        Product.objects.filter(pk=self.kettle.pk).update(name='Electric Toaster')
+        CatalogChange.record(CatalogChange.PRODUCT, [self.kettle.pk])
+        index.synced_at -= 60
+        with self.assertNumQueries(0):
+            self.assertEqual(self.complete('ket'), ['Electric Kettle'])
+        typeahead._worker.join()
+        self.assertEqual(self.complete('toa'), ['Electric Toaster'])
+
+
+class AsyncCatalogViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Kitchen')
+        cls.kettle = Product.objects.create(
+            name='Kettle', description='Brushed steel', price=Decimal('30.00'), category=cls.category, stock=5
+        )
+        cls.toaster = Product.objects.create(
+            name='Toaster', description='Two slots', price=Decimal('20.00'), category=cls.category, stock=5
+        )
+
+    async def test_product_list_search_and_ordering(self):
+        response = await self.async_client.get('/api/products/async/products/', {'ordering': '-price'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['name'] for product in response.json()], ['Kettle', 'Toaster'])
+
+        response = await self.async_client.get('/api/products/async/products/', {'search': 'steel'})
+        self.assertEqual([product['id'] for product in response.json()], [self.kettle.pk])
+
+    async def test_detail_routes(self):
+        response = await self.async_client.get(f'/api/products/async/products/{self.kettle.pk}/')
+        self.assertEqual(response.json()['name'], 'Kettle')
+        response = await self.async_client.get(f'/api/products/async/categories/{self.category.pk}/')
+        self.assertEqual(response.json()['name'], 'Kitchen')
+        response = await self.async_client.get('/api/products/async/products/999999/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_rejects_unsafe_methods(self):
+        response = await self.async_client.post('/api/products/async/products/', {})
+        self.assertEqual(response.status_code, 405)
+
+    def test_payloads_match_drf_views(self):
+        for sync_path, async_path in [
+            ('/api/products/products/', '/api/products/async/products/'),
+            (f'/api/products/products/{self.kettle.pk}/', f'/api/products/async/products/{self.kettle.pk}/'),
+            ('/api/products/categories/', '/api/products/async/categories/'),
+        ]:
+            with self.subTest(path=async_path):
+                self.assertEqual(self.client.get(async_path).json(), self.client.get(sync_path).json())
+
+
+class BackfillImageVariantsTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.category = Category.objects.create(name='Garden')
+
+    def create_product(self, name, image=None, variants=None):
+        if image == 'upload':
+            buffer = io.BytesIO()
+            Image.new('RGB', (500, 250)).save(buffer, 'PNG')
+            image = default_storage.save(f'product_images/{name}.png', ContentFile(buffer.getvalue()))
+        product = Product.objects.create(
+            name=name, description='', price=Decimal('1.00'), category=self.category, stock=1, image=image
+        )
+        # Resizing on upload only runs on commit, which never happens here
+        Product.objects.filter(pk=product.pk).update(image_variants=variants or {})
+        return product
+
+    def backfill(self, **options):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('backfill_image_variants', model='product', workers=0,
+                     stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_backfill(self):
+        missing = self.create_product('missing', image='product_images/missing.png')
+        fresh = self.create_product('fresh', image='upload')
+        current = self.create_product('current', image='upload')
+        Product.objects.filter(pk=current.pk).update(image_variants={'source': current.image.name, 'variants': {}})
+        stale = self.create_product('stale', image='upload', variants={'source': 'product_images/old.png'})
+        self.create_product('no-image')
+
+        stdout, stderr = self.backfill()
+        self.assertIn('product: 3 image(s) to process', stdout)
+        self.assertIn('product: 2 processed, 1 failed', stdout)
+        self.assertIn('product_images/missing.png', stderr)
+
+        for product in (fresh, stale):
+            product.refresh_from_db()
+            self.assertEqual(product.image_variants['source'], product.image.name)
+            self.assertEqual(product.image_variants['variants']['card']['width'], 400)
+        current.refresh_from_db()
+        self.assertEqual(current.image_variants['variants'], {})
+        missing.refresh_from_db()
+        self.assertEqual(missing.image_variants, {})
+
+        # Rows with up-to-date variants are skipped, unless forced
+        stdout, _ = self.backfill()
+        self.assertIn('product: 1 image(s) to process', stdout)
+        stdout, _ = self.backfill(force=True)
+        self.assertIn('product: 4 image(s) to process', stdout)
+        current.refresh_from_db()
+        self.assertEqual(current.image_variants['variants']['card']['width'], 400)
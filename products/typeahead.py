@@ -0,0 +1,302 @@
+"""
+In-process typeahead index over product and category names.
+
+Every word of every name is indexed in sorted arrays searched with bisect,
+so a prefix lookup never touches the database. Matches are ranked by
+popularity: units sold for products, and the units sold across a category's
+products for categories.
+
+The index is built on a background thread started by the first search in
+each process, so it is never started before a pre-forking server forks; until
+it is ready searches return nothing. Saves and deletes in this process are applied
+by the signals in products/signals.py once they commit; writes made by other
+processes (and bulk imports, which skip signals) are picked up from the
+CatalogChange log by the same thread, at most TYPEAHEAD_SYNC_INTERVAL
+seconds after a search finds the index stale. Popularity is reloaded by a
+background rebuild every TYPEAHEAD_REBUILD_INTERVAL seconds.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max, Sum
+
+from orders.models import ArchivedOrderItem, OrderItem
+from .models import CatalogChange, Category, Product
+
+PRODUCT = CatalogChange.PRODUCT
+CATEGORY = CatalogChange.CATEGORY
+MIN_PREFIX = 2
+# Above this many changed entries a full re-sort beats inserting one by one
+BULK_THRESHOLD = 256
+WORD = re.compile(r'\w+')
+
+_index = None
+_lock = threading.Lock()
+_worker = None  # The thread building or syncing the index
+
+
+def tokenize(text):
+    """Lower-cased, accent-free words of ``text``."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return WORD.findall(text)
+
+
+class Entry:
+    __slots__ = ('kind', 'pk', 'name', 'tokens', 'weight', 'rank')
+
+    def __init__(self, kind, pk, name, weight):
+        self.kind = kind
+        self.pk = pk
+        self.name = name
+        self.tokens = set(tokenize(name))
+        self.weight = weight
+        # Posting lists are sorted on this, most popular first
+        self.rank = (-weight, name.casefold(), kind, pk)
+
+    def matches(self, terms):
+        return all(any(token.startswith(term) for token in self.tokens) for term in terms)
+
+    def as_dict(self):
+        return {'type': self.kind, 'id': self.pk, 'name': self.name}
+
+
+class TypeaheadIndex:
+    """
+    ``tokens`` is the sorted vocabulary and ``postings`` maps each token to
+    the ranks of the entries containing it, best first. A prefix selects a
+    run of tokens by bisection; merging their posting lists lazily yields
+    matches in popularity order, so a query stops after ``limit`` hits
+    however common the prefix. Writers replace lists instead of mutating
+    them, so searches never need the lock.
+    """
+
+    def __init__(self, cursor=0):
+        self.tokens = []
+        self.postings = {}
+        self.entries = {}  # (kind, pk) -> Entry
+        self.cursor = cursor
+        self.built_at = self.synced_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls):
+        # Read the cursor first: changes made while loading are replayed later
+        index = cls(CatalogChange.objects.aggregate(Max('pk'))['pk__max'] or 0)
+        sold = Counter()
+        for model in (OrderItem, ArchivedOrderItem):
+            sold.update(dict(
+                model.objects.order_by().values_list('product_id').annotate(sold=Sum('quantity'))
+            ))
+        category_sold = {}
+        for pk, name, category_id in Product.objects.values_list('pk', 'name', 'category_id').iterator():
+            weight = sold.get(pk, 0)
+            category_sold[category_id] = category_sold.get(category_id, 0) + weight
+            index.entries[(PRODUCT, pk)] = Entry(PRODUCT, pk, name, weight)
+        for pk, name in Category.objects.values_list('pk', 'name'):
+            index.entries[(CATEGORY, pk)] = Entry(CATEGORY, pk, name, category_sold.get(pk, 0))
+        index.reindex()
+        return index
+
+    def reindex(self):
+        postings = {}
+        for entry in self.entries.values():
+            for token in entry.tokens:
+                postings.setdefault(token, []).append(entry.rank)
+        for ranks in postings.values():
+            ranks.sort()
+        self.postings = postings
+        self.tokens = sorted(postings)
+
+    def _add(self, entry):
+        for token in entry.tokens:
+            ranks = self.postings.get(token)
+            if ranks is None:
+                tokens = self.tokens.copy()
+                insort(tokens, token)
+                self.postings[token] = [entry.rank]
+                self.tokens = tokens
+            else:
+                ranks = ranks.copy()
+                insort(ranks, entry.rank)
+                self.postings[token] = ranks
+
+    def _discard(self, entry):
+        for token in entry.tokens:
+            ranks = [rank for rank in self.postings.get(token, ()) if rank != entry.rank]
+            if ranks:
+                self.postings[token] = ranks
+            else:
+                self.postings.pop(token, None)
+                self.tokens = [t for t in self.tokens if t != token]
+
+    def upsert(self, kind, pk, name):
+        self.upsert_many([(kind, pk, name)])
+
+    def upsert_many(self, items):
+        """Add or rename entries from (kind, pk, name); new entries start unranked."""
+        with self.lock:
+            changed = []
+            for kind, pk, name in items:
+                current = self.entries.get((kind, pk))
+                if current is not None and current.name == name:
+                    continue
+                entry = Entry(kind, pk, name, current.weight if current is not None else 0)
+                self.entries[(kind, pk)] = entry
+                changed.append((current, entry))
+            if len(changed) > BULK_THRESHOLD:
+                self.reindex()
+                return
+            for current, entry in changed:
+                if current is not None:
+                    self._discard(current)
+                self._add(entry)
+
+    def remove(self, kind, pk):
+        with self.lock:
+            entry = self.entries.pop((kind, pk), None)
+            if entry is not None:
+                self._discard(entry)
+
+    def search(self, query, limit=10, kinds=(PRODUCT, CATEGORY)):
+        terms = tokenize(query)
+        if not terms or sum(map(len, terms)) < MIN_PREFIX:
+            return []
+        # Walk the narrowest run of tokens; the other terms only filter
+        prefix = max(terms, key=len)
+        tokens, postings = self.tokens, self.postings
+        runs = []
+        position = bisect_left(tokens, prefix)
+        while position < len(tokens) and tokens[position].startswith(prefix):
+            runs.append(postings.get(tokens[position], ()))
+            position += 1
+
+        results = []
+        seen = set()
+        for _, _, kind, pk in heapq.merge(*runs):
+            if kind not in kinds or (kind, pk) in seen:
+                continue
+            seen.add((kind, pk))
+            entry = self.entries.get((kind, pk))
+            if entry is not None and entry.matches(terms):
+                results.append(entry.as_dict())
+                if len(results) == limit:
+                    break
+        return results
+
+    def sync(self):
+        """Apply changes logged by other processes since the last sync."""
+        changes = list(
+            CatalogChange.objects.filter(pk__gt=self.cursor).order_by('pk')
+            .values_list('pk', 'entity', 'object_id', 'action')
+        )
+        self.synced_at = time.monotonic()
+        if not changes:
+            return
+        latest = {}
+        for _, entity, object_id, action in changes:
+            latest[(entity, object_id)] = action
+        upserted = {PRODUCT: [], CATEGORY: []}
+        for (entity, object_id), action in latest.items():
+            if action == CatalogChange.UPSERT:
+                upserted[entity].append(object_id)
+            else:
+                self.remove(entity, object_id)
+
+        names = {
+            PRODUCT: dict(Product.objects.filter(pk__in=upserted[PRODUCT]).values_list('pk', 'name')),
+            CATEGORY: dict(Category.objects.filter(pk__in=upserted[CATEGORY]).values_list('pk', 'name')),
+        }
+        found = []
+        for entity, pks in upserted.items():
+            for pk in pks:
+                if pk in names[entity]:
+                    found.append((entity, pk, names[entity][pk]))
+                else:
+                    self.remove(entity, pk)
+        self.upsert_many(found)
+        self.cursor = changes[-1][0]
+
+
+def build():
+    """Load the index from the database and make it the process-wide one."""
+    global _index
+    index = TypeaheadIndex.build()
+    index.sync()
+    _index = index
+    return index
+
+
+def _run(target):
+    close_old_connections()
+    try:
+        target()
+    finally:
+        close_old_connections()
+
+
+def _start(target, name):
+    """Run ``target`` on the background thread unless it is already busy."""
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, args=(target,), name=name, daemon=True)
+            _worker.start()
+        return _worker
+
+
+def warm():
+    """Start building the index in the background unless it exists."""
+    if _index is None:
+        return _start(build, 'typeahead-build')
+
+
+def get_index():
+    """
+    The process-wide index. Requests never wait on the database: a cold
+    process answers from an empty index while the first build runs, and
+    stale indexes are synced or rebuilt in the background.
+    """
+    index = _index
+    if index is None:
+        warm()
+        return _empty
+    now = time.monotonic()
+    if now - index.built_at > getattr(settings, 'TYPEAHEAD_REBUILD_INTERVAL', 3600):
+        _start(build, 'typeahead-rebuild')
+    elif now - index.synced_at > getattr(settings, 'TYPEAHEAD_SYNC_INTERVAL', 5.0):
+        _start(index.sync, 'typeahead-sync')
+    return index
+
+
+_empty = TypeaheadIndex()
+
+
+def search(query, limit=10, kinds=(PRODUCT, CATEGORY)):
+    return get_index().search(query, limit, kinds)
+
+
+def upsert(kind, pk, name):
+    """Apply a committed save to the index, if this process has built one."""
+    if _index is not None:
+        _index.upsert(kind, pk, name)
+
+
+def remove(kind, pk):
+    if _index is not None:
+        _index.remove(kind, pk)
+
+
+def reset():
+    global _index
+    worker = _worker
+    if worker is not None:
+        worker.join()
+    _index = None
@@ -1,11 +1,22 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, CategoryViewSet
+from .views import CatalogChangesView, ProductViewSet, CategoryViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'categories', CategoryViewSet, basename='category')
 
+# Async, read-only mirrors of the catalog routes for ASGI deployments
+async_urlpatterns = [
+    path('products/', async_views.product_list, name='async-product-list'),
+    path('products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('categories/', async_views.category_list, name='async-category-list'),
+    path('categories/<int:pk>/', async_views.category_detail, name='async-category-detail'),
+]
+
 urlpatterns = [
+    path('async/', include(async_urlpatterns)),
+    path('changes/', CatalogChangesView.as_view(), name='catalog-changes'),
     path('', include(router.urls)),
 ]
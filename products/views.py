@@ -1,8 +1,92 @@
-from rest_framework import viewsets, filters
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from .models import Product, Category
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import CatalogChange, Product, ProductRecommendation, Category
 from .serializers import ProductSerializer, CategorySerializer
 from .permissions import IsAdminUserOrReadOnly  # Import your custom permission class
+from .importer import ProductImporter, decode_lines, read_rows
+from . import typeahead
+
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+
+class CatalogChangesView(APIView):
+    """
+    Delta feed for clients that mirror the catalog.
+
+    ``GET ?since=<cursor>`` returns the current state of every product and
+    category written after the cursor, tombstones for deleted ones, and the
+    cursor to pass next time. Start from 0 for a full sync and keep paging
+    while ``has_more`` is true.
+
+    Ids are handed out when a write happens but become visible when its
+    transaction commits, so a slow transaction can commit id 41 after id 42
+    has been served; a cursor at 42 would skip it for good. The feed therefore
+    stops at the first change younger than CATALOG_CHANGES_VISIBILITY_DELAY
+    seconds, and that delay must outlast the longest catalog transaction.
+    Recent writes show up on a later poll.
+    """
+    default_limit = 1000
+    max_limit = 5000
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = list(
+            CatalogChange.objects.filter(pk__gt=since).order_by('pk')
+            .values_list('pk', 'entity', 'object_id', 'action', 'created_at')[:limit + 1]
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        # Hold the cursor behind writes that may still have earlier ids in flight
+        visible_before = timezone.now() - timedelta(seconds=getattr(settings, 'CATALOG_CHANGES_VISIBILITY_DELAY', 5))
+        for position, change in enumerate(changes):
+            if change[4] > visible_before:
+                changes = changes[:position]
+                has_more = False
+                break
+
+        # Only the last write to each object inside the window matters
+        latest = {}
+        for _, entity, object_id, action, _ in changes:
+            latest[(entity, object_id)] = action
+        upserted = {CatalogChange.PRODUCT: set(), CatalogChange.CATEGORY: set()}
+        deleted = {CatalogChange.PRODUCT: set(), CatalogChange.CATEGORY: set()}
+        for (entity, object_id), action in latest.items():
+            (upserted if action == CatalogChange.UPSERT else deleted)[entity].add(object_id)
+
+        products = list(Product.objects.select_related('category').filter(pk__in=upserted[CatalogChange.PRODUCT]))
+        categories = list(Category.objects.filter(pk__in=upserted[CatalogChange.CATEGORY]))
+        # Rows deleted after the window closed still read as deleted
+        deleted[CatalogChange.PRODUCT] |= upserted[CatalogChange.PRODUCT] - {p.pk for p in products}
+        deleted[CatalogChange.CATEGORY] |= upserted[CatalogChange.CATEGORY] - {c.pk for c in categories}
+
+        return Response({
+            'cursor': changes[-1][0] if changes else since,
+            'has_more': has_more,
+            'products': ProductSerializer(products, many=True, context={'request': request}).data,
+            'categories': CategorySerializer(categories, many=True).data,
+            'deleted': {
+                'products': sorted(deleted[CatalogChange.PRODUCT]),
+                'categories': sorted(deleted[CatalogChange.CATEGORY]),
+            },
+        })
 
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
@@ -11,7 +95,7 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('category')
     serializer_class = ProductSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description', 'category__name']
@@ -19,3 +103,57 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     # Replace existing permission classes with your custom one
     permission_classes = [IsAdminUserOrReadOnly]
+
+    @action(detail=False, methods=['POST'], permission_classes=[IsAdminUser])
+    def bulk_import(self, request):
+        """
+        Upsert products from a CSV or NDJSON body (Content-Type text/csv or
+        application/x-ndjson). The body is streamed, never parsed as a whole.
+        """
+        content_type = request.content_type.split(';')[0].strip().lower()
+        fmt = IMPORT_CONTENT_TYPES.get(content_type)
+        if fmt is None:
+            return Response(
+                {'error': f"Unsupported content type; use one of {', '.join(IMPORT_CONTENT_TYPES)}"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+
+        importer = ProductImporter()
+        result = importer.run(read_rows(decode_lines(request.stream or []), fmt))
+        return Response(result.as_dict())
+
+    @action(detail=False, methods=['GET'], permission_classes=[AllowAny], authentication_classes=[])
+    def autocomplete(self, request):
+        """
+        Product and category names matching ``?q=`` by word prefix, most
+        popular first. Served from memory (see products/typeahead.py).
+        """
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = {
+            'products': (typeahead.PRODUCT,),
+            'categories': (typeahead.CATEGORY,),
+        }.get(request.query_params.get('type'), (typeahead.PRODUCT, typeahead.CATEGORY))
+        return Response(typeahead.search(request.query_params.get('q', ''), limit, kinds))
+
+    @action(detail=True, methods=['GET'])
+    def related(self, request, pk=None):
+        """Products most often bought together with this one (see products/recommendations.py)."""
+        try:
+            product_id = int(pk)
+        except ValueError:
+            raise Http404
+        neighbors = (
+            ProductRecommendation.objects.filter(product_id=product_id)
+            .values_list('neighbors', flat=True).first()
+        )
+        if neighbors is None:
+            self.get_object()  # 404 for unknown products, else nothing recorded yet
+            return Response([])
+
+        ids = [other_id for other_id, _ in neighbors]
+        products = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([products[i] for i in ids if i in products], many=True)
+        return Response(serializer.data)
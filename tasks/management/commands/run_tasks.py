@@ -0,0 +1,63 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks import queue
+
+PURGE_EVERY = 3600
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks until stopped (or until the queue is empty with --once).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Tasks run at the same time, each in its own thread')
+        parser.add_argument('--batch-size', type=int, default=20,
+                            help='Tasks claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit as soon as no task is due')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker = queue.worker_name()
+        concurrency = options['concurrency']
+        keep_done = timedelta(days=getattr(settings, 'TASKS_KEEP_DONE_DAYS', 7))
+        self.stdout.write(f'Worker {worker} started ({len(queue.REGISTRY)} task type(s) registered)')
+
+        executed = 0
+        next_purge = 0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='tasks') as pool:
+            while not self.stopping:
+                if time.monotonic() >= next_purge:
+                    queue.purge(timezone.now() - keep_done)
+                    next_purge = time.monotonic() + PURGE_EVERY
+
+                batch = queue.claim(worker, options['batch_size'])
+                if not batch:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                # A claimed batch is always finished, even after SIGTERM
+                if concurrency == 1:
+                    statuses = [queue.execute(task_row, worker) for task_row in batch]
+                else:
+                    statuses = list(pool.map(lambda row: queue.execute_in_thread(row, worker), batch))
+                executed += len(statuses)
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} stopped after {executed} task(s)'))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,174 @@
+"""
+A small database-backed task queue.
+
+Functions decorated with ``@task`` in an app's ``tasks.py`` are registered by
+name and queued with ``.delay()``:
+
+    @task(max_attempts=3)
+    def send_receipt(order_id):
+        ...
+
+    send_receipt.delay(order.pk, idempotency_key=f'receipt:{order.pk}')
+
+``delay`` inserts a Task row in the caller's transaction: if the request
+rolls back, nothing runs, and nothing runs before the data it needs is
+committed. ``manage.py run_tasks`` claims due rows, runs them and retries
+failures with exponential backoff. Delivery is at-least-once (a worker that
+dies mid-task has its rows reclaimed after TASKS_VISIBILITY_TIMEOUT), so task
+bodies must be safe to repeat.
+
+Workers claim a row with a conditional UPDATE (``WHERE status = 'PENDING'``)
+instead of ``SELECT ... FOR UPDATE SKIP LOCKED`` so the same code runs on
+SQLite and PostgreSQL.
+"""
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 3600
+
+REGISTRY = {}
+
+
+class TaskFunction:
+    def __init__(self, func, name, max_attempts, retry_delay):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, idempotency_key=None, run_after=None, **kwargs):
+        """Queue a call; arguments must be JSON-serializable."""
+        return enqueue(self.name, args, kwargs, idempotency_key=idempotency_key, run_after=run_after)
+
+
+def task(func=None, *, name=None, max_attempts=5, retry_delay=10):
+    """Register ``func`` as a task. ``retry_delay`` is the first backoff in seconds."""
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        REGISTRY[task_name] = TaskFunction(func, task_name, max_attempts, retry_delay)
+        return REGISTRY[task_name]
+    return register(func) if func is not None else register
+
+
+def enqueue(name, args=(), kwargs=None, idempotency_key=None, run_after=None):
+    if name not in REGISTRY:
+        raise LookupError(f'No task registered as "{name}"')
+    Task.objects.bulk_create(
+        [Task(
+            name=name,
+            args=list(args),
+            kwargs=kwargs or {},
+            idempotency_key=idempotency_key,
+            max_attempts=REGISTRY[name].max_attempts,
+            run_after=run_after or timezone.now(),
+        )],
+        ignore_conflicts=idempotency_key is not None,
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def retry_delay(task_function, attempts):
+    """Exponential backoff with jitter, so failed tasks do not retry in lockstep."""
+    delay = min(task_function.retry_delay * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _due(now):
+    timeout = getattr(settings, 'TASKS_VISIBILITY_TIMEOUT', 300)
+    # Rows still RUNNING after the timeout belong to a worker that died
+    return (Q(status=Task.PENDING, run_after__lte=now)
+            | Q(status=Task.RUNNING, locked_at__lt=now - timedelta(seconds=timeout)))
+
+
+def claim(worker, limit=10):
+    """Lock up to ``limit`` due tasks for ``worker`` and return them."""
+    now = timezone.now()
+    candidates = list(
+        Task.objects.filter(_due(now)).order_by('run_after').values_list('pk', flat=True)[:limit]
+    )
+    claimed = [
+        pk for pk in candidates
+        # Only one worker's UPDATE can still see the row as due
+        if Task.objects.filter(_due(now), pk=pk).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now,
+            attempts=F('attempts') + 1, updated_at=now,
+        )
+    ]
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_after'))
+
+
+def execute(task_row, worker):
+    """Run one claimed task and record the outcome."""
+    task_function = REGISTRY.get(task_row.name)
+    now = timezone.now()
+    try:
+        if task_function is None:
+            raise LookupError(f'No task registered as "{task_row.name}"')
+        with transaction.atomic():
+            task_function.func(*task_row.args, **task_row.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if task_function is None or task_row.attempts >= task_row.max_attempts:
+            logger.error('Task %s #%s failed permanently:\n%s', task_row.name, task_row.pk, error)
+            outcome = {'status': Task.FAILED}
+        else:
+            delay = retry_delay(task_function, task_row.attempts)
+            logger.warning('Task %s #%s failed, retrying in %.0fs:\n%s',
+                           task_row.name, task_row.pk, delay, error)
+            outcome = {'status': Task.PENDING, 'run_after': now + timedelta(seconds=delay)}
+        outcome['last_error'] = error
+    else:
+        outcome = {'status': Task.DONE, 'last_error': ''}
+
+    # Skip the write if the row was reclaimed by another worker meanwhile
+    Task.objects.filter(
+        pk=task_row.pk, status=Task.RUNNING, locked_by=worker, attempts=task_row.attempts
+    ).update(locked_by='', locked_at=None, updated_at=timezone.now(), **outcome)
+    return outcome['status']
+
+
+def execute_in_thread(task_row, worker):
+    close_old_connections()
+    try:
+        return execute(task_row, worker)
+    finally:
+        close_old_connections()
+
+
+def run_pending(worker=None, limit=None):
+    """Run due tasks inline until none are left (or ``limit`` ran); for tests and cron."""
+    worker = worker or worker_name()
+    ran = 0
+    while limit is None or ran < limit:
+        batch = claim(worker, 10 if limit is None else min(10, limit - ran))
+        if not batch:
+            break
+        for task_row in batch:
+            execute(task_row, worker)
+        ran += len(batch)
+    return ran
+
+
+def purge(older_than):
+    """Delete finished tasks last updated before ``older_than``."""
+    return Task.objects.filter(status=Task.DONE, updated_at__lt=older_than).delete()[0]
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.email import PasswordChangedConfirmationEmail
+from accounts.models import CustomUser
+from cart.models import Cart, CartItem
+from products.models import Category, Product, ProductRecommendation
+from . import queue
+from .models import Task
+
+calls = []
+
+
+@queue.task(name='tests.record', max_attempts=2)
+def record(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise RuntimeError('boom')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_run_and_idempotency_key(self):
+        record.delay('a', idempotency_key='once')
+        record.delay('a', idempotency_key='once')
+        record.delay('b')
+        self.assertEqual(queue.run_pending(), 2)
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertEqual(set(Task.objects.values_list('status', flat=True)), {Task.DONE})
+
+    def test_retry_with_backoff_then_fail(self):
+        record.delay('x', fail=True)
+        with self.assertLogs('tasks.queue', 'WARNING'):
+            queue.run_pending()
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.PENDING, 1))
+        self.assertIn('RuntimeError: boom', task.last_error)
+        self.assertGreater(task.run_after, timezone.now())
+
+        # Not due yet
+        self.assertEqual(queue.run_pending(), 0)
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            queue.run_pending()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertEqual(calls, ['x', 'x'])
+
+    def test_claim_is_exclusive_and_reclaims_stale(self):
+        record.delay('y')
+        self.assertEqual(len(queue.claim('worker-1')), 1)
+        self.assertEqual(queue.claim('worker-2'), [])
+
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        [task] = queue.claim('worker-2')
+        self.assertEqual((task.locked_by, task.attempts), ('worker-2', 2))
+        # The first worker finishing late does not overwrite the new claim
+        stale = Task(pk=task.pk, name=task.name, args=['y'], kwargs={}, attempts=1, max_attempts=2)
+        queue.execute(stale, 'worker-1')
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.locked_by), (Task.RUNNING, 'worker-2'))
+
+
+class QueuedSideEffectTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email='shopper@example.com', username='shopper', password='s3cret-pass'
+        )
+
+    def test_order_queues_recommendations(self):
+        category = Category.objects.create(name='Kitchen')
+        kettle, mug = Product.objects.bulk_create([
+            Product(name=name, description='', price=Decimal('5.00'), category=category, stock=10)
+            for name in ('Kettle', 'Mug')
+        ])
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=kettle), CartItem(cart=cart, product=mug)])
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        response = self.client.post('/api/orders/create_from_cart/', {}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(ProductRecommendation.objects.exists())
+
+        queue.run_pending()
+        self.assertEqual(ProductRecommendation.objects.get(pk=kettle.pk).neighbors, [[mug.pk, 1]])
+
+    def test_djoser_email_is_queued(self):
+        PasswordChangedConfirmationEmail(context={'user': self.user}).send(['shopper@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+
+        queue.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['shopper@example.com'])